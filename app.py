@@ -1,9 +1,13 @@
 import streamlit as st
 from typing import Dict, List
+from collections import deque
 import json
 import logging
 from background_scraper import start_background_scraping
 from rag.rag_engine import RAGEngine
+from rag.index_manager import IndexManager
+from rag import config as rag_config
+from scraper import config as scraper_config
 
 # Configure logging
 logging.basicConfig(
@@ -12,10 +16,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Chat history limits, keep rerun time independent of session length
+MAX_STORED_MESSAGES = 500  # Oldest chat messages are dropped beyond this
+HISTORY_PAGE_SIZE = 30  # Messages shown at first and added by each "Load older"
+MAX_STORED_EVENTS = 200  # Scraping progress events kept for the activity log
+VISIBLE_EVENTS = 20  # Events shown in the activity log
+
 # Initialize session state for chat history if it doesn't exist
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 
+# Scraping progress is kept apart from the chat so it doesn't grow the history
+if 'events' not in st.session_state:
+    st.session_state.events = deque(maxlen=MAX_STORED_EVENTS)
+
+if 'history_window' not in st.session_state:
+    st.session_state.history_window = HISTORY_PAGE_SIZE
+
 if 'websites' not in st.session_state:
     st.session_state.websites = {}
 
@@ -26,19 +43,67 @@ if 'scraping_queues' not in st.session_state:
 if 'previous_input' not in st.session_state:
     st.session_state.previous_input = ''
 
-def save_website(name: str, url: str):
+@st.cache_resource(show_spinner=False)
+def start_index_maintenance():
+    """Once per server process: collect retired index builds periodically and rebuild the
+    index in the background if chunking or embedding settings changed."""
+    if rag_config.QUERY_SNAPSHOT_PATH:
+        return None  # Read-only replica, the snapshot is rebuilt elsewhere
+    try:
+        manager = IndexManager()
+        manager.start_periodic_gc()
+        return manager.reindex_if_needed()
+    except Exception as e:
+        logger.error(f"Could not check the index for a rebuild: {str(e)}")
+        return None
+
+start_index_maintenance()
+
+def add_message(role: str, content: str):
+    """Append a chat message, dropping the oldest ones beyond MAX_STORED_MESSAGES."""
+    st.session_state.messages.append({"role": role, "content": content})
+    # Collapse back to the latest page so expanded history doesn't keep growing
+    st.session_state.history_window = HISTORY_PAGE_SIZE
+    overflow = len(st.session_state.messages) - MAX_STORED_MESSAGES
+    if overflow > 0:
+        del st.session_state.messages[:overflow]
+
+def add_event(content: str):
+    """Record a scraping progress event in the bounded activity log."""
+    st.session_state.events.append(content)
+
+def load_older_messages():
+    """Show another page of older chat messages."""
+    st.session_state.history_window += HISTORY_PAGE_SIZE
+
+def render_message_html(role: str, content: str) -> str:
+    """Render one chat message to HTML."""
+    if role == "user":
+        return f'<div class="chat-message user-message"><i class="fas fa-user user-icon"></i><div class="chat-message-content">{content}</div></div>'
+    return f'<div class="chat-message system-message"><div class="chat-message-content">{content}</div></div>'
+
+def parse_paths(text: str) -> List[str]:
+    """Split a comma-separated list of path patterns."""
+    return [path.strip() for path in text.split(",") if path.strip()]
+
+def save_website(name: str, url: str, include_paths: List[str], exclude_paths: List[str]):
     """Save a new website to the session state and start background scraping."""
-    st.session_state.websites[name] = {"url": url, "status": "pending"}
+    st.session_state.websites[name] = {
+        "url": url,
+        "include_paths": include_paths,
+        "exclude_paths": exclude_paths,
+        "status": "pending"
+    }
     logger.info(f"Added new website: {name} with URL: {url}")
     
-    # Add system message to chat
-    st.session_state.messages.append({
-        "role": "system",
-        "content": f"Started scraping website: {name}\nURL: {url}"
-    })
+    # Record in the activity log
+    add_event(
+        f"Started scraping website: {name}\nURL: {url}\n"
+        f"Include paths: {include_paths or 'all'}\nExclude paths: {exclude_paths or 'none'}"
+    )
     
     # Start background scraping
-    queue = start_background_scraping(url)
+    queue = start_background_scraping(url, include_paths=include_paths, exclude_paths=exclude_paths)
     st.session_state.scraping_queues[name] = queue
 
 def check_scraping_status():
@@ -49,10 +114,8 @@ def check_scraping_status():
                 while not queue.empty():
                     status = queue.get_nowait()
                     st.session_state.websites[name]["status"] = status["status"]
-                    st.session_state.messages.append({
-                        "role": "system",
-                        "content": f"Website {name}: {status['message']}"
-                    })
+                    st.session_state.websites[name]["message"] = status["message"]
+                    add_event(f"Website {name}: {status['message']}")
                     
                     if status["status"] in ["completed", "failed", "error"]:
                         st.session_state.scraping_queues[name] = None
@@ -65,6 +128,11 @@ def create_website_modal():
     with st.form(key="website_form"):
         website_name = st.text_input("Website Name", value="test")
         website_url = st.text_input("Website URL", value="https://ai.pydantic.dev/sitemap.xml")
+        include_paths = st.text_input(
+            "Include paths (comma-separated, empty for all)",
+            value=", ".join(scraper_config.DEFAULT_INCLUDE_PATHS)
+        )
+        exclude_paths = st.text_input("Exclude paths (comma-separated)", value="")
         
         # Create a container for buttons in the same row
         col1, col2 = st.columns([1, 1])  # Equal width columns for buttons
@@ -77,7 +145,7 @@ def create_website_modal():
             return True
         if submit_button and website_name and website_url:
             with st.spinner(f"Starting to scrape {website_name}..."):
-                save_website(website_name, website_url)
+                save_website(website_name, website_url, parse_paths(include_paths), parse_paths(exclude_paths))
                 logger.info(f"Scraping process initiated for {website_name}")
                 st.success(f"Successfully started scraping {website_name}")
             return True
@@ -88,7 +156,7 @@ def handle_input():
     current_input = st.session_state.user_input
     if current_input and current_input != st.session_state.previous_input:
         # Add user message to chat
-        st.session_state.messages.append({"role": "user", "content": current_input})
+        add_message("user", current_input)
         
         try:
             # Query using RAGEngine
@@ -97,14 +165,11 @@ def handle_input():
                 response = rag_engine.query(current_input)
             
             # Add AI response to chat
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            add_message("assistant", response)
             
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
-            st.session_state.messages.append({
-                "role": "assistant", 
-                "content": "Sorry, I couldn't process your question. Please try again."
-            })
+            add_message("assistant", "Sorry, I couldn't process your question. Please try again.")
         
         # Store the current input as previous
         st.session_state.previous_input = current_input
@@ -188,13 +253,25 @@ if st.session_state.get('show_modal', False):
 # Check scraping status
 check_scraping_status()
 
-# Display chat messages
-for message in st.session_state.messages:
-    with st.container():
-        if message["role"] == "user":
-            st.markdown(f'<div class="chat-message user-message"><i class="fas fa-user user-icon"></i><div class="chat-message-content">{message["content"]}</div></div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="chat-message system-message"><div class="chat-message-content">{message["content"]}</div></div>', unsafe_allow_html=True)
+# Display scraping progress: latest status per website plus a bounded activity log
+if st.session_state.websites:
+    with st.expander("Scraping activity"):
+        for name, website in st.session_state.websites.items():
+            st.markdown(f"**{name}**: {website['status']} {website.get('message', '')}")
+        recent_events = list(st.session_state.events)[-VISIBLE_EVENTS:]
+        if recent_events:
+            st.text("\n".join(recent_events))
+
+# Display the most recent chat messages, older ones on demand
+messages = st.session_state.messages
+visible_messages = messages[-st.session_state.history_window:]
+if len(messages) > len(visible_messages):
+    st.button(
+        f"Load older messages ({len(messages) - len(visible_messages)} hidden)",
+        on_click=load_older_messages
+    )
+for message in visible_messages:
+    st.markdown(render_message_html(message["role"], message["content"]), unsafe_allow_html=True)
 
 # Chat input
 with st.container():
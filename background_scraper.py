@@ -1,9 +1,15 @@
 from multiprocessing import Process, Queue
 import asyncio
 from scraper_methods import start_scraping_website
-from typing import Dict, Any
+from scraper.http import close_session
+from typing import Dict, Any, List, Optional
 
-def scraper_process(url: str, status_queue: Queue):
+def scraper_process(
+    url: str,
+    status_queue: Queue,
+    include_paths: Optional[List[str]] = None,
+    exclude_paths: Optional[List[str]] = None
+):
     """Background process to handle website scraping."""
     try:
         # Run the async scraping in a new event loop
@@ -12,7 +18,11 @@ def scraper_process(url: str, status_queue: Queue):
         
         # Execute scraping
         status_queue.put({"status": "running", "message": f"Started scraping {url}"})
-        result = loop.run_until_complete(start_scraping_website(url))
+        result = loop.run_until_complete(start_scraping_website(
+            url,
+            include_paths=include_paths,
+            exclude_paths=exclude_paths
+        ))
         
         # Send final status
         if result:
@@ -23,11 +33,17 @@ def scraper_process(url: str, status_queue: Queue):
     except Exception as e:
         status_queue.put({"status": "error", "message": str(e)})
     finally:
+        # The loop owns the shared HTTP session, so it is closed here rather than per job
+        loop.run_until_complete(close_session())
         loop.close()
 
-def start_background_scraping(url: str) -> Queue:
-    """Start the scraping process in the background."""
+def start_background_scraping(
+    url: str,
+    include_paths: Optional[List[str]] = None,
+    exclude_paths: Optional[List[str]] = None
+) -> Queue:
+    """Start the scraping process in the background, optionally with per-site path patterns."""
     status_queue = Queue()
-    process = Process(target=scraper_process, args=(url, status_queue))
+    process = Process(target=scraper_process, args=(url, status_queue, include_paths, exclude_paths))
     process.start()
     return status_queue 
\ No newline at end of file
@@ -12,6 +12,15 @@ if not GEMINI_API_KEY:
 # Vector store configuration
 CHROMA_PERSIST_DIRECTORY = "chroma_db"
 
+# Read-only query replicas: serve from a memory-mapped snapshot instead of Chroma
+# (create one with `python -m rag.snapshot <path>`)
+QUERY_SNAPSHOT_PATH = os.getenv("QUERY_SNAPSHOT_PATH")
+
+# Versioned index builds (blue/green reindexing)
+INDEX_REGISTRY_FILE = "index_registry.json"  # Alias and build metadata, inside CHROMA_PERSIST_DIRECTORY
+PAGE_STORE_FILE = "pages.jsonl"  # Scraped page content that builds are made from
+INDEX_GC_GRACE_SECONDS = 300  # Retired builds are kept this long for in-flight queries
+
 # Text splitting configuration
 CHUNK_SIZE = 500  # Smaller chunks for better retrieval
 CHUNK_OVERLAP = 100  # Decent overlap to maintain context
@@ -20,6 +29,43 @@ CHUNK_OVERLAP = 100  # Decent overlap to maintain context
 EMBEDDING_MODEL = "models/embedding-001"
 GEMINI_MODEL = "gemini-pro"
 
+# Local hashed n-gram TF-IDF embedder (see rag/embeddings.py)
+EMBEDDER = "hashing-tfidf-v1"
+EMBEDDING_DIMENSION = 384
+EMBEDDING_NGRAM_RANGE = (1, 2)  # Word unigrams and bigrams
+EMBEDDER_STATS_DIRECTORY = os.path.join(CHROMA_PERSIST_DIRECTORY, "embedder_stats")
+
+# HNSW index parameters, applied when a collection is created
+# (compare settings on a synthetic corpus with `python -m rag.hnsw_tuning`)
+HNSW_SPACE = "cosine"  # l2 | cosine | ip; embeddings are unit length, so l2 and cosine rank alike
+HNSW_M = 16  # Graph links per node: more raises recall, memory and build time
+HNSW_CONSTRUCTION_EF = 100  # Candidate list size while inserting
+HNSW_SEARCH_EF = 50  # Candidate list size per query: more raises recall and latency
+
+# LLM client configuration
+LLM_MAX_CONCURRENCY = 4  # Requests in flight per process
+LLM_MAX_RETRIES = 3  # Retries on rate limits and transient errors
+LLM_TIMEOUT = 60.0  # Deadline per call in seconds, including retries
+LLM_BASE_BACKOFF = 1.0  # First retry waits up to this long, doubling each attempt
+LLM_MAX_BACKOFF = 20.0
+
 # RAG configuration
 MAX_RELEVANT_CHUNKS = 5
-TEMPERATURE = 0.7 
\ No newline at end of file
+TEMPERATURE = 0.7
+
+# Query modes: "generate" answers with the LLM, "retrieve" returns the ranked sources only,
+# "extractive" answers with a sentence span of the top chunk when retrieval is confident
+QUERY_MODE = os.getenv("QUERY_MODE", "generate")
+EXTRACTIVE_MIN_SCORE = 0.3  # Cosine similarity the top chunk needs before generation is skipped
+EXTRACTIVE_MIN_COVERAGE = 0.75  # Share of the query's content terms the extracted span must contain
+EXTRACTIVE_MAX_SENTENCES = 2  # Longest extracted span
+
+# Metadata-filtered retrieval
+PATH_PREFIX_DEPTH = 3  # Path levels stored per chunk so prefix filters can be pushed down
+AUTO_FILTER_BY_INTENT = False  # Let a keyword classifier pick a content-type filter per query
+INTENT_MIN_SCORE = 1  # Keyword hits the winning content type needs
+INTENT_MIN_MARGIN = 1  # Hits it needs over the runner-up
+
+# Sharded search: hash chunks into NUM_SHARDS collections searched in parallel (0/1 = off)
+NUM_SHARDS = int(os.getenv("NUM_SHARDS", "0"))
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", str(os.cpu_count() or 1)))
@@ -1,15 +1,15 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 import google.generativeai as genai
 from . import config
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
         genai.configure(api_key=config.GEMINI_API_KEY)
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHUNK_SIZE,
-            chunk_overlap=config.CHUNK_OVERLAP,
+            chunk_size=chunk_size if chunk_size is not None else config.CHUNK_SIZE,
+            chunk_overlap=chunk_overlap if chunk_overlap is not None else config.CHUNK_OVERLAP,
             length_function=len,
             separators=["\n\n", "\n", ". ", ", ", " ", ""]
         )
@@ -0,0 +1,207 @@
+"""
+Local, offline text embeddings based on feature hashing.
+
+Texts are tokenized into word unigrams and bigrams, each n-gram is hashed
+(CRC32) into one of a fixed number of buckets with a hash-derived sign, and
+term counts are accumulated for a whole batch at once with np.bincount.
+
+Document vectors hold sublinear term frequencies (1 + log tf), L2-normalized,
+so they never change once stored. Inverse document frequencies are kept per
+bucket and applied to the query side only. Weighting the query by idf^2 gives
+the same unnormalized dot product as weighting both sides by idf, but documents
+are normalized on their raw TF vectors rather than their TF-IDF vectors, so
+the ranking only approximates symmetric TF-IDF cosine similarity. In exchange
+the corpus can grow without re-embedding existing chunks.
+"""
+from typing import List, Optional, Sequence
+import os
+import re
+import zlib
+import numpy as np
+from . import config
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-case word tokens of a text
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def similarity_from_distance(distance: float, space: str) -> float:
+    """
+    Convert a vector store distance into a cosine similarity score (higher is closer).
+
+    Query and document vectors are unit length, so every distance space maps onto
+    the same score: cosine and ip distances are 1 - cos, squared l2 is 2 - 2 cos.
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+class HashingEmbedder:
+    """Hashed n-gram TF-IDF embedder with persisted document frequencies."""
+
+    def __init__(
+        self,
+        dimension: int = config.EMBEDDING_DIMENSION,
+        ngram_range: Sequence[int] = config.EMBEDDING_NGRAM_RANGE,
+        stats_path: Optional[str] = None
+    ):
+        """
+        Args:
+            dimension: Number of hash buckets, i.e. the embedding size
+            ngram_range: Smallest and largest word n-gram to hash
+            stats_path: .npz file holding document frequencies; None keeps them in memory only
+        """
+        self.dimension = dimension
+        self.ngram_range = tuple(ngram_range)
+        self.stats_path = stats_path
+        self.doc_freq = np.zeros(dimension, dtype=np.float64)
+        self.num_docs = 0
+        self._stats_mtime = None
+        self._reload_stats()
+
+    def _ngrams(self, tokens: List[str]) -> List[str]:
+        low, high = self.ngram_range
+        grams = []
+        for n in range(low, high + 1):
+            if n == 1:
+                grams.extend(tokens)
+            else:
+                grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def term_frequencies(self, texts: List[str]) -> np.ndarray:
+        """
+        Signed, hashed n-gram counts for a batch of texts.
+
+        Returns:
+            np.ndarray: (len(texts), dimension) float64 matrix
+        """
+        grams_per_text = [self._ngrams(tokenize(text)) for text in texts]
+        lengths = np.fromiter((len(grams) for grams in grams_per_text), dtype=np.int64, count=len(texts))
+        counts = np.zeros((len(texts), self.dimension), dtype=np.float64)
+        if lengths.sum() == 0:
+            return counts
+
+        # Hash each distinct n-gram of the batch once, then scatter all occurrences
+        vocabulary = {}
+        inverse = np.fromiter(
+            (vocabulary.setdefault(gram, len(vocabulary)) for grams in grams_per_text for gram in grams),
+            dtype=np.int64,
+            count=int(lengths.sum())
+        )
+        hashes = np.fromiter(
+            (zlib.crc32(gram.encode('utf-8')) for gram in vocabulary),
+            dtype=np.uint32,
+            count=len(vocabulary)
+        )
+        buckets = (hashes % self.dimension).astype(np.int64)[inverse]
+        signs = np.where(hashes >> 31, -1.0, 1.0)[inverse]
+        rows = np.repeat(np.arange(len(texts)), lengths)
+
+        counts += np.bincount(
+            rows * self.dimension + buckets,
+            weights=signs,
+            minlength=len(texts) * self.dimension
+        ).reshape(len(texts), self.dimension)
+        return counts
+
+    @staticmethod
+    def _sublinear(counts: np.ndarray) -> np.ndarray:
+        magnitude = np.abs(counts)
+        scaled = np.zeros_like(counts)
+        nonzero = magnitude > 0
+        scaled[nonzero] = np.sign(counts[nonzero]) * (1.0 + np.log(magnitude[nonzero]))
+        return scaled
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed_documents(self, texts: List[str], update_stats: bool = True) -> np.ndarray:
+        """
+        Embed a batch of documents.
+
+        Args:
+            texts: Document texts
+            update_stats: Count the documents into the document frequencies (and persist them)
+
+        Returns:
+            np.ndarray: (len(texts), dimension) float32 matrix of unit vectors
+        """
+        counts = self.term_frequencies(texts)
+        if update_stats and len(texts):
+            self._reload_stats()
+            self.doc_freq += (counts != 0).sum(axis=0)
+            self.num_docs += len(texts)
+            self.save_stats()
+        return self._normalize(self._sublinear(counts)).astype(np.float32)
+
+    def idf(self) -> np.ndarray:
+        """
+        Smoothed inverse document frequency per bucket
+        """
+        return np.log((1.0 + self.num_docs) / (1.0 + self.doc_freq)) + 1.0
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of queries, weighted by idf^2 (see module docstring)
+        """
+        self._reload_stats()
+        weighted = self._sublinear(self.term_frequencies(texts)) * self.idf() ** 2
+        if self.num_docs:
+            # Buckets no document has ever used cannot match anything, yet get the highest
+            # idf; left in they only shrink every score and make scores incomparable across queries
+            weighted[:, self.doc_freq == 0] = 0.0
+        return self._normalize(weighted).astype(np.float32)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single query
+        """
+        return self.embed_queries([text])[0].tolist()
+
+    def _reload_stats(self):
+        # Another process (e.g. the background scraper) may have ingested documents since
+        if not self.stats_path or not os.path.exists(self.stats_path):
+            return
+        mtime = os.stat(self.stats_path).st_mtime_ns
+        if mtime == self._stats_mtime:
+            return
+        with np.load(self.stats_path) as stats:
+            if stats['doc_freq'].shape[0] != self.dimension:
+                raise ValueError(
+                    f"Embedder stats in {self.stats_path} have dimension {stats['doc_freq'].shape[0]}, "
+                    f"expected {self.dimension}"
+                )
+            self.doc_freq = stats['doc_freq'].astype(np.float64)
+            self.num_docs = int(stats['num_docs'])
+        self._stats_mtime = mtime
+
+    def save_stats(self):
+        """
+        Persist document frequencies atomically
+        """
+        if not self.stats_path:
+            return
+        os.makedirs(os.path.dirname(self.stats_path) or '.', exist_ok=True)
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, doc_freq=self.doc_freq, num_docs=np.array(self.num_docs))
+        os.replace(tmp_path, self.stats_path)
+        self._stats_mtime = os.stat(self.stats_path).st_mtime_ns
+
+    def reset_stats(self):
+        """
+        Forget all document frequencies, e.g. when the collection is cleared
+        """
+        self.doc_freq = np.zeros(self.dimension, dtype=np.float64)
+        self.num_docs = 0
+        self.save_stats()
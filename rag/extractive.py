@@ -0,0 +1,84 @@
+"""
+Extractive answers: pick the sentence span of a chunk that best covers a query.
+
+Used to answer confidently retrieved queries straight from the top chunk
+without calling the language model.
+"""
+from typing import List, Optional, Set, Tuple
+import re
+from . import config
+from .embeddings import tokenize
+
+# Sentence ends, blank lines, and markdown headings / list items / table rows start new sentences.
+# Stored chunks have their whitespace collapsed, so headings are also recognized inline.
+SENTENCE_BOUNDARY = re.compile(
+    r"(?<=[.!?])\s+|\n\s*\n|\n(?=\s*(?:#|[-*+]\s|\d+[.)]\s|\|))|\s+(?=#{1,6}\s)"
+)
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "should", "so",
+    "that", "the", "this", "to", "use", "what", "when", "where", "which", "who", "why",
+    "with", "you", "your"
+}
+
+
+def content_terms(text: str) -> Set[str]:
+    """
+    Distinct tokens of a text without stop words
+    """
+    return {token for token in tokenize(text) if token not in STOP_WORDS}
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split chunk text into sentences, skipping fragments without any words
+    """
+    sentences = []
+    for part in SENTENCE_BOUNDARY.split(text):
+        part = " ".join(part.split())
+        if tokenize(part):
+            sentences.append(part)
+    return sentences
+
+
+def extract_answer(
+    query: str,
+    text: str,
+    max_sentences: Optional[int] = None
+) -> Optional[Tuple[str, float]]:
+    """
+    Find the span of consecutive sentences covering the most query terms.
+
+    Ties go to the shorter, then the earlier span.
+
+    Args:
+        query: The user's question
+        text: Chunk to extract from
+        max_sentences: Longest span to consider (defaults to config.EXTRACTIVE_MAX_SENTENCES)
+
+    Returns:
+        (span, coverage) where coverage is the share of query terms the span contains,
+        or None if the query has no content terms or no span contains any of them
+    """
+    if max_sentences is None:
+        max_sentences = config.EXTRACTIVE_MAX_SENTENCES
+    query_terms = content_terms(query)
+    if not query_terms:
+        return None
+
+    sentences = split_sentences(text)
+    sentence_terms = [content_terms(sentence) & query_terms for sentence in sentences]
+    best: Optional[Tuple[int, int, int]] = None  # (hits, start, end)
+    for start in range(len(sentences)):
+        covered: Set[str] = set()
+        for end in range(start, min(start + max_sentences, len(sentences))):
+            covered |= sentence_terms[end]
+            hits = len(covered)
+            if best is None or hits > best[0] or (hits == best[0] and end - start < best[2] - best[1]):
+                best = (hits, start, end)
+
+    if best is None or best[0] == 0:
+        return None
+    hits, start, end = best
+    return " ".join(sentences[start:end + 1]), hits / len(query_terms)
@@ -0,0 +1,79 @@
+"""
+Local fake of the Gemini GenerativeModel for tests and load experiments.
+
+Implements generate_content with configurable latency and injected failures,
+and counts upstream calls, so retry, timeout and request coalescing behaviour
+of LLMClient can be exercised without network access or an API key:
+
+    model = FakeGenerativeModel(latency=0.2, fail_first=2)
+    engine = RAGEngine(llm_client=LLMClient(model))
+"""
+from typing import Any, Callable, List, Optional
+import threading
+import time
+
+
+class FakeAPIError(Exception):
+    """Error carrying an HTTP status code, like google.api_core exceptions."""
+
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(message or f"Fake API error {code}")
+        self.code = code
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Stand-in for genai.GenerativeModel."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        fail_first: int = 0,
+        failure_code: int = 429,
+        reply: Optional[Callable[[str], str]] = None
+    ):
+        """
+        Args:
+            latency: Seconds every call takes
+            fail_first: Number of initial calls that fail with failure_code
+            failure_code: HTTP status of the injected failures
+            reply: Builds the response text from the prompt (defaults to an echo)
+        """
+        self.latency = latency
+        self.fail_first = fail_first
+        self.failure_code = failure_code
+        self.reply = reply or (lambda prompt: f"Fake answer ({len(prompt)} prompt characters)")
+        self.calls = 0
+        self.prompts: List[str] = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate_content(
+        self,
+        prompt: str,
+        generation_config: Any = None,
+        request_options: Optional[dict] = None
+    ) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+            self.prompts.append(prompt)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            timeout = (request_options or {}).get("timeout")
+            if timeout is not None and self.latency > timeout:
+                time.sleep(timeout)
+                raise FakeAPIError(504, "Deadline exceeded")
+            time.sleep(self.latency)
+            if call_number <= self.fail_first:
+                raise FakeAPIError(self.failure_code)
+            return FakeResponse(self.reply(prompt))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
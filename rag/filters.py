@@ -0,0 +1,145 @@
+"""
+Structured metadata filters for retrieval, and a cheap query-intent classifier.
+
+Filters are plain dicts:
+    {"type": "api"}                   exact match on a metadata field
+    {"type": ["api", "guide"]}        any of several values
+    {"path_prefix": "/api/models"}    page path starts with these path segments
+
+Chroma has no prefix operator, so chunks store their path prefixes up to
+PATH_PREFIX_DEPTH levels as separate metadata fields ("path_prefix_1" = "/api/",
+"path_prefix_2" = "/api/models/", ...). A prefix filter becomes an equality
+match on one of those fields and is pushed down into the vector query; only
+prefixes deeper than PATH_PREFIX_DEPTH need an extra check on the results.
+"""
+from typing import Any, Dict, List, Optional
+import re
+from . import config
+
+PATH_PREFIX_KEY = "path_prefix"
+
+# Keywords hinting at each content type produced by the sitemap extractor
+INTENT_KEYWORDS = {
+    "api": {
+        "api", "class", "classes", "function", "functions", "method", "methods", "parameter",
+        "parameters", "param", "argument", "arguments", "kwargs", "signature", "returns",
+        "attribute", "attributes", "reference", "field", "fields", "constructor"
+    },
+    "examples": {
+        "example", "examples", "sample", "samples", "demo", "snippet", "snippets", "show"
+    },
+    "guide": {
+        "how", "guide", "tutorial", "setup", "install", "installation", "configure",
+        "getting", "started", "why", "concept", "concepts", "overview", "introduction"
+    }
+}
+
+
+def _path_segments(path: str) -> List[str]:
+    return [segment for segment in path.split('/') if segment]
+
+
+def _prefix_value(segments: List[str]) -> str:
+    return "/" + "/".join(segments) + "/"
+
+
+def path_prefix_metadata(path: str) -> Dict[str, str]:
+    """
+    Build the path_prefix_<depth> metadata fields for a page path.
+
+    Args:
+        path: URL path of the page, e.g. /api/models/gemini/
+
+    Returns:
+        Dict[str, str]: e.g. {"path_prefix_1": "/api/", "path_prefix_2": "/api/models/", ...}
+    """
+    segments = _path_segments(path)
+    return {
+        f"{PATH_PREFIX_KEY}_{depth}": _prefix_value(segments[:depth])
+        for depth in range(1, min(len(segments), config.PATH_PREFIX_DEPTH) + 1)
+    }
+
+
+def build_where(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Translate filters into a Chroma `where` clause.
+
+    Returns:
+        The where clause, or None when there is nothing to filter on
+    """
+    if not filters:
+        return None
+
+    clauses = []
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if key == PATH_PREFIX_KEY:
+            segments = _path_segments(value)
+            if not segments:
+                continue
+            depth = min(len(segments), config.PATH_PREFIX_DEPTH)
+            clauses.append({f"{PATH_PREFIX_KEY}_{depth}": {"$eq": _prefix_value(segments[:depth])}})
+        elif isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": list(value)}})
+        else:
+            clauses.append({key: {"$eq": value}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def needs_post_filter(filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Whether the where clause alone is not exact (a path prefix deeper than PATH_PREFIX_DEPTH)
+    """
+    prefix = (filters or {}).get(PATH_PREFIX_KEY)
+    return bool(prefix) and len(_path_segments(prefix)) > config.PATH_PREFIX_DEPTH
+
+
+def value_matches(key: str, value: Any, expected: Any) -> bool:
+    """
+    Check a single metadata value against one filter entry.
+    For the path prefix filter, `value` is the page path.
+    """
+    if key == PATH_PREFIX_KEY:
+        if not isinstance(value, str):
+            return False
+        prefix = _path_segments(expected)
+        return _path_segments(value)[:len(prefix)] == prefix
+    if isinstance(expected, (list, tuple, set)):
+        return value in expected
+    return value == expected
+
+
+def matches(metadata: Dict[str, Any], filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate filters against a metadata dict in Python
+    """
+    for key, expected in (filters or {}).items():
+        if expected is None:
+            continue
+        field = "path" if key == PATH_PREFIX_KEY else key
+        if field not in metadata or not value_matches(key, metadata[field], expected):
+            return False
+    return True
+
+
+def classify_query_intent(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Guess which content type a question is about from keywords.
+
+    Returns:
+        A filter such as {"type": "api"}, or None when no type clearly wins
+    """
+    tokens = re.findall(r"[a-z_]+", query.lower())
+    scores = {
+        content_type: sum(token in keywords for token in tokens)
+        for content_type, keywords in INTENT_KEYWORDS.items()
+    }
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_type, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score >= config.INTENT_MIN_SCORE and best_score - runner_up >= config.INTENT_MIN_MARGIN:
+        return {"type": best_type}
+    return None
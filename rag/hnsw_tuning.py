@@ -0,0 +1,265 @@
+"""
+Recall/latency tuning harness for the HNSW index parameters.
+
+Builds a Chroma collection for every combination of M, construction_ef and
+search_ef on a synthetic topical corpus embedded with the production embedder,
+and reports for each one:
+- recall@k of the HNSW results against exact brute-force search
+- build time (inserting the whole corpus)
+- median and p99 latency of single queries
+- size of the persisted collection on disk
+
+Run with `python -m rag.hnsw_tuning --documents 20000 --m 8 16 32 --search-ef 10 50 100`
+and copy the chosen operating point into the HNSW_* settings in rag/config.py.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+from . import config
+from .embeddings import HashingEmbedder
+from .vector_store import hnsw_collection_metadata
+
+# Documents inserted per add() call while building
+BUILD_BATCH_SIZE = 1000
+
+
+def synthetic_corpus(
+    num_documents: int,
+    num_queries: int,
+    num_topics: int = 50,
+    words_per_document: int = 120,
+    words_per_query: int = 8,
+    seed: int = 0
+) -> Tuple[List[str], List[str]]:
+    """
+    Generate documents and queries with topical, Zipf-distributed vocabularies.
+
+    Every document draws most of its words from the vocabulary of one topic and the
+    rest from a shared vocabulary, roughly like pages of a documentation site.
+    Queries are short runs of words taken from random documents.
+
+    Returns:
+        (documents, queries)
+    """
+    rng = np.random.default_rng(seed)
+    topic_vocabulary = 400
+    shared_vocabulary = 2000
+    topics = rng.integers(0, num_topics, size=num_documents)
+
+    def zipf_indices(size, vocabulary):
+        return np.minimum(rng.zipf(1.3, size=size) - 1, vocabulary - 1)
+
+    documents = []
+    for topic in topics:
+        topical = rng.random(words_per_document) < 0.6
+        topic_words = zipf_indices(words_per_document, topic_vocabulary)
+        shared_words = zipf_indices(words_per_document, shared_vocabulary)
+        documents.append(" ".join(
+            f"t{topic}w{topic_word}" if is_topical else f"w{shared_word}"
+            for is_topical, topic_word, shared_word in zip(topical, topic_words, shared_words)
+        ))
+
+    queries = []
+    for doc_index in rng.integers(0, num_documents, size=num_queries):
+        words = documents[doc_index].split()
+        start = int(rng.integers(0, max(1, len(words) - words_per_query)))
+        queries.append(" ".join(words[start:start + words_per_query]))
+    return documents, queries
+
+
+def brute_force_neighbors(
+    document_vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    k: int,
+    space: str
+) -> np.ndarray:
+    """
+    Exact top-k rows per query under the given distance space
+
+    Returns:
+        (num_queries, k) array of row indices, closest first
+    """
+    dots = query_vectors @ document_vectors.T
+    if space == "l2":
+        doc_norms = np.einsum('ij,ij->i', document_vectors, document_vectors)
+        distances = doc_norms[None, :] - 2.0 * dots
+    else:
+        # Embeddings are unit length, so cosine and inner product rank alike
+        distances = -dots
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def evaluate_setting(
+    document_vectors: np.ndarray,
+    query_vectors: np.ndarray,
+    exact: np.ndarray,
+    k: int,
+    space: str,
+    m: int,
+    construction_ef: int,
+    search_ef: int
+) -> Dict[str, Any]:
+    """
+    Build a throwaway collection with one HNSW setting and measure it.
+
+    Returns:
+        Dict with the setting, recall@k, build time, query latencies and on-disk size
+    """
+    persist_directory = tempfile.mkdtemp(prefix="hnsw_tuning_")
+    client = chromadb.PersistentClient(
+        path=persist_directory,
+        settings=Settings(
+            anonymized_telemetry=False,
+            is_persistent=True
+        )
+    )
+    try:
+        collection = client.create_collection(
+            "tuning",
+            metadata=hnsw_collection_metadata(space, m, construction_ef, search_ef)
+        )
+
+        build_start = time.perf_counter()
+        for start in range(0, len(document_vectors), BUILD_BATCH_SIZE):
+            end = min(start + BUILD_BATCH_SIZE, len(document_vectors))
+            collection.add(
+                ids=[str(row) for row in range(start, end)],
+                embeddings=document_vectors[start:end].tolist()
+            )
+        build_seconds = time.perf_counter() - build_start
+
+        latencies = []
+        hits = 0
+        for query_vector, expected in zip(query_vectors, exact):
+            query_start = time.perf_counter()
+            results = collection.query(
+                query_embeddings=[query_vector.tolist()],
+                n_results=k,
+                include=["distances"]
+            )
+            latencies.append(time.perf_counter() - query_start)
+            found = {int(doc_id) for doc_id in results['ids'][0]}
+            hits += len(found.intersection(expected.tolist()))
+
+        return {
+            "space": space,
+            "M": m,
+            "construction_ef": construction_ef,
+            "search_ef": search_ef,
+            "recall_at_k": hits / (len(query_vectors) * k),
+            "build_seconds": build_seconds,
+            "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "query_p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "disk_bytes": _directory_size(persist_directory)
+        }
+    finally:
+        clear_cache = getattr(client, 'clear_system_cache', None)
+        if clear_cache:
+            clear_cache()
+        shutil.rmtree(persist_directory, ignore_errors=True)
+
+
+def run_grid(
+    num_documents: int = 10000,
+    num_queries: int = 200,
+    k: int = config.MAX_RELEVANT_CHUNKS,
+    space: str = config.HNSW_SPACE,
+    m_values: Optional[List[int]] = None,
+    construction_ef_values: Optional[List[int]] = None,
+    search_ef_values: Optional[List[int]] = None,
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Measure every combination of the given HNSW parameters on one synthetic corpus.
+
+    Returns:
+        One result dict per setting (see evaluate_setting)
+    """
+    m_values = m_values or [config.HNSW_M]
+    construction_ef_values = construction_ef_values or [config.HNSW_CONSTRUCTION_EF]
+    search_ef_values = search_ef_values or [config.HNSW_SEARCH_EF]
+
+    print(f"Generating {num_documents} documents and {num_queries} queries")
+    documents, queries = synthetic_corpus(num_documents, num_queries, seed=seed)
+    embedder = HashingEmbedder()
+    document_vectors = embedder.embed_documents(documents)
+    query_vectors = embedder.embed_queries(queries)
+    exact = brute_force_neighbors(document_vectors, query_vectors, k, space)
+
+    results = []
+    for m, construction_ef, search_ef in itertools.product(m_values, construction_ef_values, search_ef_values):
+        print(f"Building index with M={m}, construction_ef={construction_ef}, search_ef={search_ef}")
+        result = evaluate_setting(
+            document_vectors, query_vectors, exact, k, space, m, construction_ef, search_ef
+        )
+        print(
+            f"  recall@{k}={result['recall_at_k']:.3f} build={result['build_seconds']:.1f}s "
+            f"p99={result['query_p99_ms']:.2f}ms disk={result['disk_bytes'] / 2**20:.1f}MiB"
+        )
+        results.append(result)
+    return results
+
+
+def format_results(results: List[Dict[str, Any]], k: int) -> str:
+    """
+    Render results as a fixed-width table, best recall first
+    """
+    header = f"{'M':>4} {'constr_ef':>9} {'search_ef':>9} {f'recall@{k}':>9} {'build_s':>8} {'p50_ms':>7} {'p99_ms':>7} {'disk_MiB':>8}"
+    lines = [header, "-" * len(header)]
+    for result in sorted(results, key=lambda r: (-r["recall_at_k"], r["query_p99_ms"])):
+        lines.append(
+            f"{result['M']:>4} {result['construction_ef']:>9} {result['search_ef']:>9} "
+            f"{result['recall_at_k']:>9.3f} {result['build_seconds']:>8.1f} "
+            f"{result['query_p50_ms']:>7.2f} {result['query_p99_ms']:>7.2f} "
+            f"{result['disk_bytes'] / 2**20:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure HNSW recall and latency for several index settings")
+    parser.add_argument("--documents", type=int, default=10000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=config.MAX_RELEVANT_CHUNKS, help="Results per query")
+    parser.add_argument("--space", choices=("l2", "cosine", "ip"), default=config.HNSW_SPACE)
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[config.HNSW_CONSTRUCTION_EF])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_grid(
+        args.documents,
+        args.queries,
+        args.k,
+        args.space,
+        args.m,
+        args.construction_ef,
+        args.search_ef,
+        args.seed
+    )
+    print()
+    print(format_results(results, args.k))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
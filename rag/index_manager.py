@@ -0,0 +1,260 @@
+"""
+Blue/green index builds.
+
+A build chunks and embeds the stored page content into a fresh shadow
+collection while queries keep being served from the active one. Once the
+build is verified, the registry alias is swapped atomically (VectorStore
+instances follow it on their next query) and retired builds are deleted
+after a grace period that lets in-flight queries finish.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import threading
+import time
+from . import config
+from .document_processor import DocumentProcessor
+from .index_registry import IndexRegistry, LEGACY_COLLECTION
+from .page_store import PageStore, scraped_result_to_document
+from .vector_store import VectorStore, hnsw_collection_metadata
+
+# Pages chunked and embedded per add_documents call while building
+BUILD_BATCH_PAGES = 50
+
+
+def current_build_settings(
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Settings that determine the content of an index build
+    """
+    return {
+        "chunk_size": chunk_size if chunk_size is not None else config.CHUNK_SIZE,
+        "chunk_overlap": chunk_overlap if chunk_overlap is not None else config.CHUNK_OVERLAP,
+        "embedder": config.EMBEDDER,
+        "embedding_dimension": config.EMBEDDING_DIMENSION,
+        "embedding_ngram_range": list(config.EMBEDDING_NGRAM_RANGE),
+        "num_shards": config.NUM_SHARDS,
+        "hnsw": hnsw_collection_metadata()
+    }
+
+
+class IndexManager:
+    """Builds, verifies, activates and garbage-collects versioned index builds."""
+
+    def __init__(self, registry: Optional[IndexRegistry] = None, page_store: Optional[PageStore] = None):
+        self.registry = registry or IndexRegistry()
+        self.page_store = page_store or PageStore()
+
+    def needs_reindex(self) -> bool:
+        """
+        Whether the active build was made with different settings than the current config
+        """
+        build = self.registry.get_build(self.registry.active_name())
+        return build is None or build.get("settings") != current_build_settings()
+
+    def reindex_if_needed(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Rebuild the index if the active build is out of date with the current settings,
+        e.g. after CHUNK_SIZE or the embedder changed.
+        
+        Returns:
+            The background thread, or None if nothing needed rebuilding or it ran in the foreground
+        """
+        if not self.needs_reindex():
+            return None
+        if not self.page_store.load():
+            print("Index settings changed but the page store is empty, scrape a website to build an index")
+            return None
+        print(f"Active index build '{self.registry.active_name()}' is out of date, rebuilding")
+        return self.reindex(background=background)
+    
+    def build(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        activate: bool = True
+    ) -> str:
+        """
+        Build a new index from the page store into a shadow collection.
+
+        Args:
+            chunk_size: Chunk size for this build (defaults to config.CHUNK_SIZE)
+            chunk_overlap: Chunk overlap for this build (defaults to config.CHUNK_OVERLAP)
+            activate: Swap the alias to the new build once it is verified
+
+        Returns:
+            str: Name of the new build
+
+        Raises:
+            ValueError: The page store is empty or the build failed verification
+        """
+        pages = self.page_store.load()
+        if not pages:
+            raise ValueError("No stored pages to build an index from")
+
+        settings = current_build_settings(chunk_size, chunk_overlap)
+        name = f"{LEGACY_COLLECTION}_{int(time.time() * 1000)}"
+        self.registry.record_build(name, settings)
+        print(f"Building index '{name}' from {len(pages)} pages with {settings}")
+
+        try:
+            store = VectorStore(collection_name=name)
+            processor = DocumentProcessor(settings["chunk_size"], settings["chunk_overlap"])
+            expected = 0
+            for start in range(0, len(pages), BUILD_BATCH_PAGES):
+                documents = [scraped_result_to_document(page) for page in pages[start:start + BUILD_BATCH_PAGES]]
+                chunks = processor.process_documents(documents)
+                store.add_documents(chunks)
+                expected += len(chunks)
+            self._verify(store, expected, pages)
+        except Exception as e:
+            print(f"Index build '{name}' failed: {str(e)}")
+            self.registry.set_status(name, "failed", error=str(e), failed_at=time.time())
+            self.garbage_collect()
+            raise
+
+        self.registry.set_status(name, "ready", document_count=expected)
+        print(f"Index build '{name}' is ready with {expected} chunks")
+        if activate:
+            self.activate(name)
+        return name
+
+    def _verify(self, store: VectorStore, expected: int, pages: List[Dict[str, Any]]):
+        count = store.count_documents()
+        if count == 0 or count != expected:
+            raise ValueError(f"Build holds {count} chunks, expected {expected}")
+        # A query for a stored page's own text must find something
+        probe = pages[0]['content'][:200]
+        if not store.similarity_search(probe, k=1):
+            raise ValueError("Verification query returned no results")
+
+    def activate(self, name: str):
+        """
+        Point the alias at a ready build; queries switch over on their next call
+        """
+        build = self.registry.get_build(name)
+        if build is None or build["status"] not in ("ready", "retired"):
+            raise ValueError(f"Build '{name}' is not ready to be activated")
+        previous = self.registry.active_name()
+        self.registry.activate(name)
+        print(f"Index alias switched from '{previous}' to '{name}'")
+
+    def garbage_collect(self, grace_seconds: Optional[float] = None):
+        """
+        Delete failed builds and builds retired longer than the grace period ago
+        """
+        if grace_seconds is None:
+            grace_seconds = config.INDEX_GC_GRACE_SECONDS
+        now = time.time()
+        active = self.registry.active_name()
+        for name, build in self.registry.builds().items():
+            if name == active:
+                continue
+            expired = build["status"] == "retired" and now - build.get("retired_at", 0) >= grace_seconds
+            if build["status"] == "failed" or expired:
+                VectorStore(collection_name=name).delete_collections()
+                self.registry.remove_build(name)
+                print(f"Garbage-collected index build '{name}'")
+
+    def start_periodic_gc(self, interval: Optional[float] = None) -> threading.Thread:
+        """
+        Collect builds in a daemon thread every interval seconds, so builds retired by
+        other, short-lived processes (e.g. scraper jobs) are deleted outside the query path.
+
+        Args:
+            interval: Seconds between collections (defaults to config.INDEX_GC_GRACE_SECONDS)
+        """
+        if interval is None:
+            interval = config.INDEX_GC_GRACE_SECONDS
+
+        def run():
+            while True:
+                try:
+                    self.garbage_collect()
+                except Exception as e:
+                    print(f"Index garbage collection failed: {str(e)}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="index-gc", daemon=True)
+        thread.start()
+        return thread
+
+    def reindex(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        background: bool = True
+    ) -> Optional[threading.Thread]:
+        """
+        Rebuild the index with new settings without interrupting queries.
+
+        In the background the build runs in a daemon thread that also collects
+        the retired build once its grace period has passed. In the foreground,
+        builds retired earlier are collected right away and the one just retired
+        is collected by a timer after its grace period. If the process exits
+        first, a long-running process's periodic collection (see
+        start_periodic_gc) or `python -m rag.index_manager gc` collects it.
+
+        Returns:
+            The background thread, or None when run in the foreground
+        """
+        def run():
+            try:
+                self.build(chunk_size, chunk_overlap)
+            except Exception:
+                return
+            time.sleep(config.INDEX_GC_GRACE_SECONDS)
+            self.garbage_collect()
+
+        if not background:
+            self.build(chunk_size, chunk_overlap)
+            self.garbage_collect()
+            timer = threading.Timer(config.INDEX_GC_GRACE_SECONDS, self.garbage_collect)
+            timer.daemon = True
+            timer.start()
+            return None
+
+        thread = threading.Thread(target=run, name="index-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage versioned index builds")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("status", help="Show the active build and whether it is out of date")
+    reindex_parser = subcommands.add_parser(
+        "reindex",
+        help="Rebuild the index from the page store and swap it in without interrupting queries"
+    )
+    reindex_parser.add_argument("--chunk-size", type=int)
+    reindex_parser.add_argument("--chunk-overlap", type=int)
+    reindex_parser.add_argument(
+        "--if-needed",
+        action="store_true",
+        help="Only rebuild when the active build was made with other settings than the current config"
+    )
+    subcommands.add_parser("gc", help="Delete failed builds and retired builds past their grace period")
+    args = parser.parse_args()
+
+    manager = IndexManager()
+    if args.command == "status":
+        active = manager.registry.active_name()
+        print(f"Active build: {active}")
+        print(json.dumps(manager.registry.get_build(active), indent=2))
+        print(f"Current settings: {current_build_settings()}")
+        print(f"Needs reindex: {manager.needs_reindex()}")
+    elif args.command == "reindex":
+        if args.if_needed and not manager.needs_reindex():
+            print("Active build matches the current settings, nothing to do")
+        else:
+            manager.build(args.chunk_size, args.chunk_overlap)
+            # This process is the only one to collect the retired build, so wait out its grace period
+            print(f"Waiting {config.INDEX_GC_GRACE_SECONDS}s for in-flight queries before collecting the retired build")
+            time.sleep(config.INDEX_GC_GRACE_SECONDS)
+            manager.garbage_collect()
+    elif args.command == "gc":
+        manager.garbage_collect()
@@ -0,0 +1,144 @@
+"""
+Registry of versioned index builds and the alias pointing at the live one.
+
+Stored as JSON next to the Chroma data:
+
+    {
+        "active": "documents_1700000000000",
+        "builds": {
+            "documents_1700000000000": {
+                "status": "active",        # building | ready | active | retired | failed
+                "settings": {...},         # chunking and embedder settings of the build
+                "created_at": ...,
+                "document_count": ...
+            }
+        }
+    }
+
+Every change rewrites the file through a temporary file and os.replace, so
+readers always see either the old or the new alias, never a partial write.
+Changes hold an exclusive lock on a sidecar .lock file, so builds running in
+separate scraper processes don't overwrite each other's entries.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import json
+import os
+import threading
+import time
+from . import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: changes are only serialized within one process
+    fcntl = None
+
+# Collection used before builds were versioned
+LEGACY_COLLECTION = "documents"
+
+
+class IndexRegistry:
+    """File-backed registry of index builds with an atomically swapped alias."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(config.CHROMA_PERSIST_DIRECTORY, config.INDEX_REGISTRY_FILE)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Any] = {"active": LEGACY_COLLECTION, "builds": {}}
+        self._mtime = None
+
+    def _load(self) -> Dict[str, Any]:
+        # Cheap enough to call per query: the file is only parsed again after it changed
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return self._data
+        if mtime != self._mtime:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+        return self._data
+
+    def _save(self, data: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._data = data
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def active_name(self) -> str:
+        """
+        Name of the collection queries should be served from
+        """
+        return self._load()["active"]
+
+    def builds(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self._load()["builds"])
+
+    def get_build(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._load()["builds"].get(name)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _update(self, change):
+        with self._locked():
+            # Re-read under the lock, another process may have written since our last read
+            self._mtime = None
+            data = json.loads(json.dumps(self._load()))
+            change(data)
+            self._save(data)
+
+    def record_build(self, name: str, settings: Dict[str, Any]):
+        """
+        Register a new build that is being written
+        """
+        def change(data):
+            data["builds"][name] = {
+                "status": "building",
+                "settings": settings,
+                "created_at": time.time(),
+                "document_count": 0
+            }
+        self._update(change)
+
+    def set_status(self, name: str, status: str, **fields):
+        def change(data):
+            build = data["builds"].setdefault(name, {"settings": {}, "created_at": time.time()})
+            build["status"] = status
+            build.update(fields)
+        self._update(change)
+
+    def activate(self, name: str):
+        """
+        Atomically point the alias at a build and retire the previous one
+        """
+        def change(data):
+            previous = data["active"]
+            if previous != name:
+                retired = data["builds"].setdefault(previous, {"settings": {}, "created_at": 0})
+                retired["status"] = "retired"
+                retired["retired_at"] = time.time()
+            data["builds"][name]["status"] = "active"
+            data["builds"][name]["activated_at"] = time.time()
+            data["active"] = name
+        self._update(change)
+
+    def remove_build(self, name: str):
+        def change(data):
+            data["builds"].pop(name, None)
+        self._update(change)
@@ -0,0 +1,184 @@
+"""
+Resilient client for LLM calls.
+
+Wraps a Gemini GenerativeModel (or anything with the same generate_content
+interface) and:
+- caps the number of requests in flight
+- retries rate-limited and transient failures with jittered exponential backoff
+- enforces a deadline per call, covering queueing, retries and backoff
+- coalesces identical concurrent prompts into a single upstream request
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional, Tuple
+import inspect
+import random
+import threading
+import time
+import google.generativeai as genai
+from . import config
+
+RATE_LIMIT_STATUS_CODES = {429}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RATE_LIMIT_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+RETRYABLE_ERRORS = RATE_LIMIT_ERRORS | {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded"}
+
+
+class LLMError(Exception):
+    """Base class for errors raised by LLMClient."""
+
+
+class LLMRateLimitError(LLMError):
+    """The model kept rate limiting us after all retries."""
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish before its deadline."""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    # google.api_core exceptions expose the HTTP status as .code
+    code = getattr(error, 'code', None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return _status_code(error) in RATE_LIMIT_STATUS_CODES or type(error).__name__ in RATE_LIMIT_ERRORS
+
+
+def is_retryable_error(error: Exception) -> bool:
+    return _status_code(error) in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERRORS
+
+
+class LLMClient:
+    """Concurrency-capped, retrying, single-flight wrapper around a generative model."""
+
+    def __init__(
+        self,
+        model,
+        max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+        max_retries: int = config.LLM_MAX_RETRIES,
+        timeout: float = config.LLM_TIMEOUT,
+        base_backoff: float = config.LLM_BASE_BACKOFF,
+        max_backoff: float = config.LLM_MAX_BACKOFF
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._supports_request_options = self._accepts_request_options(model)
+
+    @staticmethod
+    def _accepts_request_options(model) -> bool:
+        try:
+            return 'request_options' in inspect.signature(model.generate_content).parameters
+        except (TypeError, ValueError):
+            return False
+
+    def generate(
+        self,
+        prompt: str,
+        generation_config: Any = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        """
+        Generate a response for a prompt.
+
+        Concurrent calls with the same prompt and generation config share one
+        upstream request and all receive its result (or its error).
+
+        Args:
+            prompt: The prompt to send
+            generation_config: Passed through to generate_content
+            timeout: Deadline for the whole call in seconds (defaults to the client timeout)
+
+        Returns:
+            str: The generated text
+
+        Raises:
+            LLMRateLimitError: The model was still rate limiting after all retries
+            LLMTimeoutError: The deadline passed
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        key = (prompt, repr(generation_config))
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not is_leader:
+            try:
+                return future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                raise LLMTimeoutError(f"LLM call did not finish within {timeout:.1f}s")
+
+        try:
+            text = self._generate_with_retries(prompt, generation_config, deadline)
+            future.set_result(text)
+            return text
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _generate_with_retries(self, prompt: str, generation_config: Any, deadline: float) -> str:
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._semaphore.acquire(timeout=remaining):
+                raise LLMTimeoutError("Timed out waiting for a free LLM request slot")
+            try:
+                kwargs = {"generation_config": generation_config}
+                if self._supports_request_options:
+                    kwargs["request_options"] = {"timeout": max(0.1, deadline - time.monotonic())}
+                response = self.model.generate_content(prompt, **kwargs)
+                return response.text
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+                if attempt == self.max_retries:
+                    if is_rate_limit_error(e):
+                        raise LLMRateLimitError(f"LLM still rate limited after {attempt + 1} attempts") from e
+                    if time.monotonic() >= deadline:
+                        raise LLMTimeoutError("LLM call did not finish within its deadline") from e
+                    raise
+                error = e
+            finally:
+                self._semaphore.release()
+
+            # Full jitter keeps retries from many callers from arriving in lockstep
+            backoff = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+            if time.monotonic() + backoff >= deadline:
+                if is_rate_limit_error(error):
+                    raise LLMRateLimitError("LLM rate limited and no time left to retry") from error
+                raise LLMTimeoutError("No time left to retry the LLM call") from error
+            print(f"LLM call failed ({type(error).__name__}), retrying in {backoff:.2f}s")
+            time.sleep(backoff)
+
+        raise LLMError("LLM call failed")  # Not reached, the loop always returns or raises
+
+
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(model_name: str = config.GEMINI_MODEL) -> LLMClient:
+    """
+    Get the process-wide client for a model, so the concurrency cap and request
+    coalescing apply across all RAGEngine instances.
+    """
+    with _clients_lock:
+        client = _clients.get(model_name)
+        if client is None:
+            genai.configure(api_key=config.GEMINI_API_KEY)
+            client = LLMClient(genai.GenerativeModel(model_name))
+            _clients[model_name] = client
+        return client
@@ -0,0 +1,71 @@
+"""
+Store of scraped page content, so indexes can be rebuilt without re-crawling.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import os
+from langchain.schema import Document
+from . import config
+from .filters import path_prefix_metadata
+
+
+def scraped_result_to_document(result: Dict[str, Any]) -> Document:
+    """
+    Build a Document with ChromaDB-compatible metadata from one scraped page result
+    """
+    # Convert images list to a string representation for metadata
+    images_str = ';'.join(
+        f"{img.get('url', '')}|{img.get('title', '')}|{img.get('alt', '')}"
+        for img in result['images']
+    ) if result.get('images') else ''
+
+    return Document(
+        page_content=result['content'],
+        metadata={
+            "url": result['url'],
+            "type": result['type'],
+            "path": result['path'],
+            "source": result['source'],
+            "images": images_str,  # Store images as a delimited string
+            **path_prefix_metadata(result['path'])  # Enables path prefix filters
+        }
+    )
+
+
+class PageStore:
+    """JSONL file of successfully scraped pages."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(config.CHROMA_PERSIST_DIRECTORY, config.PAGE_STORE_FILE)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Read all stored pages, later entries for the same URL win
+        """
+        pages: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    page = json.loads(line)
+                    pages[page['url']] = page
+        return list(pages.values())
+
+    def replace(self, pages: List[Dict[str, Any]]):
+        """
+        Atomically replace the stored pages
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for page in pages:
+                f.write(json.dumps(page, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def append(self, pages: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for page in pages:
+                f.write(json.dumps(page, ensure_ascii=False) + '\n')
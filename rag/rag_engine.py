@@ -1,16 +1,87 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import threading
 import google.generativeai as genai
 from langchain.schema import Document
 from .document_processor import DocumentProcessor
 from .vector_store import VectorStore
+from .snapshot import SnapshotIndex
+from .filters import classify_query_intent
+from .extractive import extract_answer
+from .index_manager import IndexManager
+from .page_store import PageStore, scraped_result_to_document
+from .llm_client import LLMClient, LLMRateLimitError, LLMTimeoutError, get_llm_client
 from . import config
 
-class RAGEngine:
+QUERY_MODES = ("generate", "retrieve", "extractive")
+
+# Outcomes of queries that had results but were answered without the LLM
+SKIPPED_OUTCOMES = ("retrieve", "extractive")
+
+
+class QueryStats:
+    """Process-wide count of how queries were answered, and how often the LLM was skipped.
+
+    Queries without results never reach generation, so they are counted separately
+    and left out of the skip rate."""
+    
     def __init__(self):
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        
+    def record(self, outcome: str):
+        """
+        Count one answered query ("generated", "extractive", "retrieve" or "no_results")
+        """
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+        summary = self.summary()
+        answered = summary["skipped"] + summary["generated"]
+        if answered:
+            print(
+                f"Generation skipped for {summary['skipped']} of {answered} answered queries "
+                f"({summary['skip_rate']:.0%}), {summary['no_results']} without results"
+            )
+        
+    def summary(self) -> Dict[str, Any]:
+        """
+        Counts per outcome plus totals and the share of answered queries that skipped the LLM
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        generated = counts.get("generated", 0)
+        skipped = sum(counts.get(outcome, 0) for outcome in SKIPPED_OUTCOMES)
+        return {
+            "queries": sum(counts.values()),
+            "generated": generated,
+            "skipped": skipped,
+            "no_results": counts.get("no_results", 0),
+            "skip_rate": skipped / (skipped + generated) if skipped + generated else 0.0,
+            "outcomes": counts
+        }
+
+
+query_stats = QueryStats()
+
+
+class RAGEngine:
+    def __init__(self, snapshot_path: Optional[str] = None, llm_client: Optional[LLMClient] = None):
+        """
+        Args:
+            snapshot_path: Serve queries from a read-only memory-mapped snapshot
+                instead of the Chroma store (defaults to config.QUERY_SNAPSHOT_PATH)
+            llm_client: Client used for generation (defaults to the shared Gemini client;
+                pass one wrapping rag.fake_llm.FakeGenerativeModel for tests)
+        """
+        self.llm_client = llm_client or get_llm_client()
+        self.model = self.llm_client.model
         self.document_processor = DocumentProcessor()
-        self.vector_store = VectorStore()
+        self.page_store = PageStore()
+        
+        snapshot_path = snapshot_path or config.QUERY_SNAPSHOT_PATH
+        if snapshot_path:
+            self.vector_store = SnapshotIndex(snapshot_path)
+        else:
+            self.vector_store = VectorStore()
         
     def add_documents(self, documents: List[Document]):
         """
@@ -30,51 +101,158 @@ class RAGEngine:
         """
         Populate the database from scraped results.
         
+        Pages are also kept in the page store, so the index can later be rebuilt
+        with other chunking or embedding settings without crawling again.
+        
         Args:
             scraped_results: List of dictionaries containing scraped content and metadata
-            clear_db: Whether to clear the database before adding new documents
+            clear_db: Replace all existing content. The new content is built into a shadow
+                index and swapped in atomically, so queries keep being answered meanwhile.
         """
+        pages = [
+            result for result in scraped_results
+            if result['status'] == 'success' and result['content']
+        ]
+        if not pages:
+            print("\nNo successfully scraped pages to add")
+            return
+        
         if clear_db:
-            self.vector_store.clear_database()
-            print("Cleared existing database")
-        
-        successful_docs = 0
-        for result in scraped_results:
-            if result['status'] == 'success' and result['content']:
-                # Convert images list to a string representation for metadata
-                images_str = ';'.join(
-                    f"{img.get('url', '')}|{img.get('title', '')}|{img.get('alt', '')}"
-                    for img in result['images']
-                ) if result['images'] else ''
-                
-                # Create a document with metadata that ChromaDB can handle
-                doc = Document(
-                    page_content=result['content'],
-                    metadata={
-                        "url": result['url'],
-                        "type": result['type'],
-                        "path": result['path'],
-                        "source": result['source'],
-                        "images": images_str  # Store images as a delimited string
-                    }
-                )
-                
-                # Add the document to the vector store
-                self.add_documents([doc])
-                successful_docs += 1
+            self.page_store.replace(pages)
+            IndexManager(page_store=self.page_store).reindex(background=False)
+            self.vector_store.refresh()
+        else:
+            self.page_store.append(pages)
+            self.add_documents([scraped_result_to_document(page) for page in pages])
                 
-        print(f"\nSuccessfully added {successful_docs} documents to the database")
+        print(f"\nSuccessfully added {len(pages)} documents to the database")
+        
+    def _search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        auto_filter: Optional[bool] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Retrieve scored chunks, letting the intent classifier pick a filter if enabled
+        """
+        if auto_filter is None:
+            auto_filter = config.AUTO_FILTER_BY_INTENT
+            
+        inferred_filter = False
+        if not filters and auto_filter:
+            filters = classify_query_intent(query)
+            inferred_filter = filters is not None
+            if inferred_filter:
+                print(f"Query intent classified as {filters}")
+        
+        results = self.vector_store.similarity_search_with_scores(query, k, filters)
+        if not results and inferred_filter:
+            # The guessed filter was too narrow, fall back to searching everything
+            results = self.vector_store.similarity_search_with_scores(query, k)
+        return results
+        
+    def retrieve(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        auto_filter: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieval only: the ranked chunks for a query, without calling the language model
+        
+        Args:
+            query: The user's question
+            k: Number of chunks (defaults to config.MAX_RELEVANT_CHUNKS)
+            filters: Optional metadata filters (see query)
+            auto_filter: Let the intent classifier pick a filter when none is given
+        
+        Returns:
+            List of dicts with rank, url, score (cosine similarity), content and metadata, best first
+        """
+        return [
+            {
+                "rank": rank,
+                "url": doc.metadata.get('url', 'unknown'),
+                "score": score,
+                "content": doc.page_content,
+                "metadata": doc.metadata
+            }
+            for rank, (doc, score) in enumerate(self._search(query, k, filters, auto_filter), 1)
+        ]
         
-    def query(self, query: str) -> str:
+    def query(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        auto_filter: Optional[bool] = None,
+        mode: Optional[str] = None
+    ) -> str:
         """
         Execute a RAG query
+        
+        Args:
+            query: The user's question
+            filters: Optional metadata filters, e.g. {"type": "api"} or {"path_prefix": "/api/"}
+            auto_filter: Let the intent classifier pick a filter when none is given
+                (defaults to config.AUTO_FILTER_BY_INTENT)
+            mode: "generate", "retrieve" (list the ranked sources) or "extractive" (answer from
+                the top chunk when retrieval is confident, generate otherwise).
+                Defaults to config.QUERY_MODE
         """
+        mode = mode or config.QUERY_MODE
+        if mode not in QUERY_MODES:
+            raise ValueError(f"Unknown query mode '{mode}', expected one of {QUERY_MODES}")
+        
         # Retrieve relevant documents
-        relevant_docs = self.vector_store.similarity_search(query)
+        results = self._search(query, filters=filters, auto_filter=auto_filter)
         
-        if not relevant_docs:
+        if not results:
+            query_stats.record("no_results")
             return "I don't have enough information to answer that question."
         
+        if mode == "retrieve":
+            query_stats.record("retrieve")
+            return self._format_sources(results)
+        
+        if mode == "extractive":
+            answer = self._extract(query, results)
+            if answer is not None:
+                query_stats.record("extractive")
+                return answer
+        
+        query_stats.record("generated")
+        return self._generate(query, [doc for doc, _ in results])
+        
+    @staticmethod
+    def _format_sources(results: List[Tuple[Document, float]]) -> str:
+        lines = []
+        for rank, (doc, score) in enumerate(results, 1):
+            preview = " ".join(doc.page_content.split())[:300]
+            lines.append(f"{rank}. {doc.metadata.get('url', 'unknown')} (score {score:.2f})\n   {preview}")
+        return "\n\n".join(lines)
+        
+    @staticmethod
+    def _extract(query: str, results: List[Tuple[Document, float]]) -> Optional[str]:
+        """
+        Answer from the top chunk if both retrieval and the extracted span are confident
+        """
+        top_doc, top_score = results[0]
+        if top_score < config.EXTRACTIVE_MIN_SCORE:
+            return None
+        extracted = extract_answer(query, top_doc.page_content)
+        if extracted is None or extracted[1] < config.EXTRACTIVE_MIN_COVERAGE:
+            return None
+        span, coverage = extracted
+        print(f"Answering extractively (score {top_score:.3f}, coverage {coverage:.2f})")
+        return f"{span}\n\nSource: {top_doc.metadata.get('url', 'unknown')}"
+        
+    def _generate(self, query: str, relevant_docs: List[Document]) -> str:
+        """
+        Answer the query with the language model, using the retrieved chunks as context
+        """
         # Construct the prompt with context
         context_parts = []
         for doc in relevant_docs:
@@ -102,7 +280,7 @@ Please provide a clear, accurate answer based on the documentation above. If the
         
         try:
             # Generate response using Gemini
-            response = self.model.generate_content(
+            return self.llm_client.generate(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=0.3,  # Lower temperature for more focused responses
@@ -110,7 +288,12 @@ Please provide a clear, accurate answer based on the documentation above. If the
                     max_output_tokens=1024,
                 )
             )
-            return response.text
+        except LLMRateLimitError as e:
+            print(f"Rate limited while generating response: {str(e)}")
+            return "The language model is receiving too many requests right now. Please try again in a minute."
+        except LLMTimeoutError as e:
+            print(f"Timed out generating response: {str(e)}")
+            return "The language model took too long to respond. Please try again."
         except Exception as e:
             print(f"Error generating response: {str(e)}")
             return "I encountered an error while generating the response. Please try again." 
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""
+Sharded vector search across a warm process pool.
+
+In sharded mode chunks are hashed by id into NUM_SHARDS Chroma collections on
+ingest. A query is sent to every shard in parallel; each pool worker keeps its
+own Chroma client open between queries, and the per-shard top-k results are
+merged into a global top-k. Shards are pinned to workers (shard i always goes
+to worker i % num_workers), so each process only loads the indexes of its own
+shards instead of every worker ending up with the whole corpus in memory.
+
+Chroma clients cache index segments per process, so writers bump a generation
+marker on disk after each change and workers reopen their client when the
+generation of a query differs from the one they loaded.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import heapq
+import multiprocessing
+import os
+import zlib
+import chromadb
+from chromadb.config import Settings
+
+GENERATION_FILE = "shard_generation"
+
+# (distance, document, metadata)
+ShardHit = Tuple[float, str, Dict[str, Any]]
+
+# Per-worker state, set up by _init_worker
+_worker_persist_directory: Optional[str] = None
+_worker_client = None
+_worker_generation: Optional[str] = None
+_worker_collections: Dict[str, Any] = {}
+
+
+def shard_collection_name(base_name: str, shard: int) -> str:
+    return f"{base_name}_shard_{shard}"
+
+
+def shard_for_id(doc_id: str, num_shards: int) -> int:
+    """
+    Stable shard assignment for a chunk id
+    """
+    return zlib.crc32(doc_id.encode('utf-8')) % num_shards
+
+
+def read_generation(persist_directory: str) -> str:
+    """
+    Read the current shard generation marker ("" if no writes happened yet)
+    """
+    try:
+        with open(os.path.join(persist_directory, GENERATION_FILE), 'r') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_generation(persist_directory: str):
+    """
+    Record that shard contents changed, so pool workers reload their indexes
+    """
+    path = os.path.join(persist_directory, GENERATION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(os.getpid()) + "-" + os.urandom(8).hex())
+    os.replace(tmp_path, path)
+
+
+def _open_worker_client(generation: str):
+    global _worker_client, _worker_generation
+    if _worker_client is not None:
+        # Drop Chroma's per-process system cache so the reopened client reads fresh segments
+        clear_cache = getattr(_worker_client, 'clear_system_cache', None)
+        if clear_cache:
+            clear_cache()
+    _worker_client = chromadb.PersistentClient(
+        path=_worker_persist_directory,
+        settings=Settings(
+            anonymized_telemetry=False,
+            is_persistent=True
+        )
+    )
+    _worker_collections.clear()
+    _worker_generation = generation
+
+
+def _init_worker(persist_directory: str):
+    global _worker_persist_directory
+    _worker_persist_directory = persist_directory
+    _open_worker_client(read_generation(persist_directory))
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _loaded_collections() -> List[str]:
+    return sorted(_worker_collections)
+
+
+def _query_shard(
+    collection_name: str,
+    query_embedding: List[float],
+    n_results: int,
+    where: Optional[Dict[str, Any]],
+    generation: str
+) -> List[ShardHit]:
+    if generation != _worker_generation:
+        _open_worker_client(generation)
+
+    collection = _worker_collections.get(collection_name)
+    if collection is None:
+        try:
+            collection = _worker_client.get_collection(collection_name)
+        except Exception:
+            return []  # Shard not created yet
+        _worker_collections[collection_name] = collection
+
+    shard_count = collection.count()
+    if shard_count == 0:
+        return []
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=min(n_results, shard_count),
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
+    if not results['documents']:
+        return []
+    return list(zip(results['distances'][0], results['documents'][0], results['metadatas'][0]))
+
+
+class ShardedSearchPool:
+    """Worker processes that query shards in parallel and merge their top-k."""
+
+    def __init__(self, persist_directory: str, num_workers: int):
+        self.persist_directory = persist_directory
+        self.num_workers = num_workers
+        self.broken = False
+        # One single-process executor per worker, so a shard always runs in the same process.
+        # Forked workers would inherit the parent's Chroma client, its locks and
+        # background threads, and deadlock; start them fresh instead
+        context = multiprocessing.get_context("spawn")
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(persist_directory,)
+            )
+            for _ in range(num_workers)
+        ]
+        # Start every worker now so the first queries don't pay for process start-up
+        for future in [executor.submit(_ping) for executor in self._executors]:
+            future.result()
+        print(f"Started sharded search pool with {num_workers} workers")
+
+    def worker_for_shard(self, shard: int) -> ProcessPoolExecutor:
+        """
+        Executor of the worker that serves a shard
+        """
+        return self._executors[shard % self.num_workers]
+
+    def search(
+        self,
+        collection_names: List[str],
+        query_embedding: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[ShardHit]:
+        """
+        Query all shards in parallel and merge their results.
+
+        Args:
+            collection_names: Shard collections in shard order, so the list position picks the worker
+
+        Returns:
+            The global top n_results hits, closest first
+
+        Raises:
+            BrokenProcessPool: If a worker died; the pool is marked broken and can't be reused
+        """
+        generation = read_generation(self.persist_directory)
+        try:
+            futures = [
+                self.worker_for_shard(shard).submit(
+                    _query_shard, name, query_embedding, n_results, where, generation
+                )
+                for shard, name in enumerate(collection_names)
+            ]
+            hits = [hit for future in futures for hit in future.result()]
+        except BrokenProcessPool:
+            self.broken = True
+            raise
+        return heapq.nsmallest(n_results, hits, key=lambda hit: hit[0])
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_search_pools: Dict[str, ShardedSearchPool] = {}
+
+
+def get_search_pool(persist_directory: str, num_workers: int) -> ShardedSearchPool:
+    """
+    Get the process-wide search pool for a persistence directory, starting it on first use
+    and replacing it if one of its workers died
+    """
+    pool = _search_pools.get(persist_directory)
+    if pool is not None and pool.broken:
+        print("Sharded search pool is broken, starting a new one")
+        discard_search_pool(persist_directory)
+        pool = None
+    if pool is None:
+        pool = ShardedSearchPool(persist_directory, num_workers)
+        _search_pools[persist_directory] = pool
+    return pool
+
+
+def discard_search_pool(persist_directory: str):
+    """
+    Shut down and forget the search pool of a persistence directory, if any
+    """
+    pool = _search_pools.pop(persist_directory, None)
+    if pool is not None:
+        pool.shutdown()
+
+
+def search_shards(
+    persist_directory: str,
+    num_workers: int,
+    collection_names: List[str],
+    query_embedding: List[float],
+    n_results: int,
+    where: Optional[Dict[str, Any]] = None
+) -> List[ShardHit]:
+    """
+    Search shards on the process-wide pool, retrying once on a fresh pool if a worker died
+    (e.g. killed by the OOM killer) so one crash doesn't fail every later query
+    """
+    try:
+        return get_search_pool(persist_directory, num_workers).search(
+            collection_names, query_embedding, n_results, where
+        )
+    except BrokenProcessPool as e:
+        print(f"Sharded search worker died: {str(e)}")
+    return get_search_pool(persist_directory, num_workers).search(
+        collection_names, query_embedding, n_results, where
+    )
+
+
+@atexit.register
+def _shutdown_search_pools():
+    for pool in _search_pools.values():
+        pool.shutdown()
+    _search_pools.clear()
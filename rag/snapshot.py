@@ -0,0 +1,457 @@
+"""
+Compact, memory-mapped snapshots of a vector collection for read-only query replicas.
+
+A snapshot is a directory holding:
+- manifest.json: format version, counts, vector dimension, quantization, distance
+  space, the settings of the embedder that built the vectors and the files of
+  every metadata column
+- vectors.npy: float16 vectors, or int8 vectors with per-row scales in scales.npy
+- norms.npy: squared norms of the stored (dequantized) vectors
+- texts.bin / texts_offsets.npy: UTF-8 chunk texts and their byte offsets
+- ids.bin / ids_offsets.npy: chunk ids and their byte offsets
+- meta_<n>.npy: one dictionary-encoded int32 column per metadata key (-1 = missing)
+- meta_<n>_values.bin / meta_<n>_values_offsets.npy: the JSON-encoded dictionary of
+  that column, so high-cardinality columns (url, path, ...) stay out of the manifest
+- embedder_stats.npz: document frequencies the query embedder needs
+
+All arrays are opened with mmap, so replicas start without loading the index into
+memory and share its pages through the OS page cache.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import mmap
+import os
+import shutil
+import time
+import numpy as np
+from langchain.schema import Document
+from .embeddings import HashingEmbedder, similarity_from_distance
+from .filters import PATH_PREFIX_KEY, value_matches
+from . import config
+
+SNAPSHOT_FORMAT_VERSION = 3
+QUANTIZATIONS = ("float16", "int8")
+
+# Rows converted to float32 at a time while scanning, bounds the scratch memory per query
+SEARCH_BLOCK_ROWS = 16384
+
+# Distinct filters whose matching dictionary codes are kept per snapshot
+FILTER_CACHE_SIZE = 1024
+
+
+def _write_blob(path: str, values: List[str]) -> np.ndarray:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path, 'wb') as f:
+        for i, value in enumerate(values):
+            data = value.encode('utf-8')
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    return offsets
+
+
+class _Blob:
+    """Read-only, memory-mapped view of a blob of strings indexed by offsets."""
+
+    def __init__(self, path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        self._file = open(path, 'rb')
+        if os.path.getsize(path) > 0:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b''
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[int(self.offsets[i]):int(self.offsets[i + 1])].decode('utf-8')
+
+
+def _iter_batches(collections, batch_size: int):
+    for source in collections:
+        offset = 0
+        while True:
+            batch = source.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            if not batch['ids']:
+                break
+            yield batch
+            offset += len(batch['ids'])
+
+
+def embedder_settings(embedder: HashingEmbedder, name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Settings a query embedder needs to reproduce the vectors of an index
+    """
+    return {
+        "name": name or config.EMBEDDER,
+        "dimension": embedder.dimension,
+        "ngram_range": list(embedder.ngram_range)
+    }
+
+
+def export_snapshot(
+    collection,
+    path: str,
+    quantization: str = "float16",
+    batch_size: int = 1000,
+    embedder_stats_path: Optional[str] = None,
+    embedder: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Export a Chroma collection (or all shards of a sharded store) to a snapshot directory.
+
+    The snapshot is written next to the target and moved into place once complete,
+    so readers never see a half-written snapshot.
+
+    Args:
+        collection: Chroma collection to export, or a list of shard collections
+        path: Target snapshot directory (replaced if it exists)
+        quantization: "float16" or "int8" (per-row symmetric scaling)
+        batch_size: Number of records read from the collection per request
+        embedder_stats_path: Document frequencies of the embedder that built the vectors
+        embedder: Settings of that embedder (see embedder_settings); defaults to the
+            current config with the dimension of the exported vectors
+
+    Returns:
+        Dict[str, Any]: The snapshot manifest
+    """
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization '{quantization}', expected one of {QUANTIZATIONS}")
+
+    collections = collection if isinstance(collection, list) else [collection]
+    count = sum(source.count() for source in collections)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    vectors = None
+    dimension = 0
+    scales = np.ones(count, dtype=np.float32)
+    norms = np.zeros(count, dtype=np.float32)
+    texts: List[str] = []
+    ids: List[str] = []
+    column_values: Dict[str, Dict[Tuple[str, Any], int]] = {}
+    column_codes: Dict[str, np.ndarray] = {}
+
+    row = 0
+    for batch in _iter_batches(collections, batch_size):
+        # Records added after export started don't fit in the preallocated arrays
+        batch_len = min(len(batch['ids']), count - row)
+        if batch_len <= 0:
+            break
+        batch = {key: batch[key][:batch_len] for key in ('ids', 'embeddings', 'documents', 'metadatas')}
+        embeddings = np.asarray(batch['embeddings'], dtype=np.float32)
+        end = row + batch_len
+
+        if vectors is None:
+            dimension = embeddings.shape[1]
+            dtype = np.float16 if quantization == "float16" else np.int8
+            vectors = np.lib.format.open_memmap(
+                os.path.join(tmp_path, 'vectors.npy'), mode='w+',
+                dtype=dtype, shape=(count, dimension)
+            )
+
+        if quantization == "int8":
+            batch_scales = np.abs(embeddings).max(axis=1) / 127.0
+            batch_scales[batch_scales == 0] = 1.0
+            quantized = np.clip(np.rint(embeddings / batch_scales[:, None]), -127, 127).astype(np.int8)
+            vectors[row:end] = quantized
+            scales[row:end] = batch_scales
+            stored = quantized.astype(np.float32) * batch_scales[:, None]
+        else:
+            vectors[row:end] = embeddings.astype(np.float16)
+            stored = vectors[row:end].astype(np.float32)
+        norms[row:end] = np.einsum('ij,ij->i', stored, stored)
+
+        texts.extend(doc or '' for doc in batch['documents'])
+        ids.extend(batch['ids'])
+
+        # Dictionary-encode metadata into one int32 column per key
+        for i, metadata in enumerate(batch['metadatas']):
+            for key, value in (metadata or {}).items():
+                if key not in column_codes:
+                    column_values[key] = {}
+                    column_codes[key] = np.full(count, -1, dtype=np.int32)
+                values = column_values[key]
+                value_key = (type(value).__name__, value)
+                if value_key not in values:
+                    values[value_key] = len(values)
+                column_codes[key][row + i] = values[value_key]
+
+        row = end
+        print(f"Exported {row}/{count} records")
+
+    if vectors is None:
+        raise ValueError("Cannot export an empty collection")
+    vectors.flush()
+    del vectors
+
+    texts_offsets = _write_blob(os.path.join(tmp_path, 'texts.bin'), texts)
+    ids_offsets = _write_blob(os.path.join(tmp_path, 'ids.bin'), ids)
+    np.save(os.path.join(tmp_path, 'texts_offsets.npy'), texts_offsets)
+    np.save(os.path.join(tmp_path, 'ids_offsets.npy'), ids_offsets)
+    np.save(os.path.join(tmp_path, 'norms.npy'), norms[:row])
+    if quantization == "int8":
+        np.save(os.path.join(tmp_path, 'scales.npy'), scales[:row])
+
+    metadata_columns = {}
+    for n, (key, values) in enumerate(column_values.items()):
+        file_name = f"meta_{n}.npy"
+        values_name = f"meta_{n}_values.bin"
+        offsets_name = f"meta_{n}_values_offsets.npy"
+        np.save(os.path.join(tmp_path, file_name), column_codes[key][:row])
+        values_offsets = _write_blob(
+            os.path.join(tmp_path, values_name),
+            [json.dumps(value) for (_, value) in sorted(values, key=values.get)]
+        )
+        np.save(os.path.join(tmp_path, offsets_name), values_offsets)
+        metadata_columns[key] = {
+            "file": file_name,
+            "values": values_name,
+            "values_offsets": offsets_name
+        }
+
+    collection_metadata = getattr(collections[0], 'metadata', None) or {}
+    manifest = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "collection": collections[0].name,
+        "count": row,
+        "dimension": int(dimension),
+        "quantization": quantization,
+        "embedder": embedder or {
+            "name": config.EMBEDDER,
+            "dimension": int(dimension),
+            "ngram_range": list(config.EMBEDDING_NGRAM_RANGE)
+        },
+        "space": collection_metadata.get("hnsw:space", "l2"),
+        "created_at": time.time(),
+        "metadata_columns": metadata_columns
+    }
+    if embedder_stats_path and os.path.exists(embedder_stats_path):
+        shutil.copyfile(embedder_stats_path, os.path.join(tmp_path, 'embedder_stats.npz'))
+
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    # Swap the finished snapshot into place
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    print(f"Exported {row} records to snapshot {path} ({quantization})")
+    return manifest
+
+
+class SnapshotIndex:
+    """
+    Read-only vector index served directly from a memory-mapped snapshot.
+
+    Exposes the query side of VectorStore (count_documents, similarity_search) so
+    RAGEngine can use it in place of a Chroma-backed store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.manifest.get('version')} in {path}")
+
+        self.vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        self.norms = np.load(os.path.join(path, 'norms.npy'), mmap_mode='r')
+        self.scales = None
+        if self.manifest["quantization"] == "int8":
+            self.scales = np.load(os.path.join(path, 'scales.npy'), mmap_mode='r')
+        self.texts = _Blob(os.path.join(path, 'texts.bin'), os.path.join(path, 'texts_offsets.npy'))
+        self.ids = _Blob(os.path.join(path, 'ids.bin'), os.path.join(path, 'ids_offsets.npy'))
+        self.metadata_columns = {
+            key: (
+                np.load(os.path.join(path, column["file"]), mmap_mode='r'),
+                _Blob(os.path.join(path, column["values"]), os.path.join(path, column["values_offsets"]))
+            )
+            for key, column in self.manifest["metadata_columns"].items()
+        }
+        self._allowed_codes: Dict[Tuple[str, str], np.ndarray] = {}
+        # Queries must be embedded exactly like the snapshot's vectors were
+        settings = self.manifest["embedder"]
+        if settings["name"] != config.EMBEDDER:
+            raise ValueError(
+                f"Snapshot {path} was built with embedder '{settings['name']}', "
+                f"this process embeds queries with '{config.EMBEDDER}'"
+            )
+        self.embedder = HashingEmbedder(
+            dimension=settings["dimension"],
+            ngram_range=settings["ngram_range"],
+            stats_path=os.path.join(path, 'embedder_stats.npz')
+        )
+        print(f"Opened snapshot {path} with {self.count_documents()} documents")
+
+    def count_documents(self) -> int:
+        """
+        Get the number of documents in the snapshot
+        """
+        return int(self.manifest["count"])
+
+    def get_metadata(self, i: int) -> Dict[str, Any]:
+        """
+        Rebuild the metadata dict of one record from the columnar store
+        """
+        metadata = {}
+        for key, (codes, values) in self.metadata_columns.items():
+            code = int(codes[i])
+            if code >= 0:
+                metadata[key] = json.loads(values[code])
+        return metadata
+
+    def get_vectors(self, start: int, end: int) -> np.ndarray:
+        """
+        Get dequantized float32 vectors for rows [start, end)
+        """
+        block = self.vectors[start:end].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:end, None]
+        return block
+
+    def filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Evaluate metadata filters into a boolean row mask.
+
+        Filters are checked once per distinct value in each column's dictionary and
+        then applied to the code arrays, so the cost does not depend on text size.
+        The matching codes are cached per filter entry, so repeated filters skip the
+        dictionary scan.
+        """
+        if not filters:
+            return None
+        mask = np.ones(self.count_documents(), dtype=bool)
+        for key, expected in filters.items():
+            if expected is None:
+                continue
+            field = "path" if key == PATH_PREFIX_KEY else key
+            if field not in self.metadata_columns:
+                return np.zeros(self.count_documents(), dtype=bool)
+            codes = self.metadata_columns[field][0]
+            mask &= np.isin(codes, self._allowed(key, field, expected))
+        return mask
+
+    def _allowed(self, key: str, field: str, expected: Any) -> np.ndarray:
+        """
+        Dictionary codes of a column that satisfy one filter entry
+        """
+        if isinstance(expected, (list, tuple, set)):
+            cache_key = (key, json.dumps(sorted(expected, key=repr), default=str))
+        else:
+            cache_key = (key, json.dumps(expected, default=str))
+        allowed = self._allowed_codes.get(cache_key)
+        if allowed is None:
+            values = self.metadata_columns[field][1]
+            allowed = np.array(
+                [code for code in range(len(values)) if value_matches(key, json.loads(values[code]), expected)],
+                dtype=np.int32
+            )
+            if len(self._allowed_codes) >= FILTER_CACHE_SIZE:
+                self._allowed_codes.pop(next(iter(self._allowed_codes)), None)
+            self._allowed_codes[cache_key] = allowed
+        return allowed
+
+    def search_vectors(
+        self,
+        query_embedding: List[float],
+        k: int,
+        mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Exact search over the snapshot, optionally restricted to rows where mask is True.
+
+        Returns:
+            List of (row, distance) pairs, closest first, using the collection's distance space
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = float(query @ query)
+        space = self.manifest["space"]
+        count = self.count_documents()
+        k = min(k, count)
+        best_rows = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0, dtype=np.float32)
+
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, count)
+            rows = np.arange(start, end)
+            if mask is not None:
+                rows = rows[mask[start:end]]
+                if len(rows) == 0:
+                    continue
+            dots = self.vectors[rows].astype(np.float32) @ query
+            if self.scales is not None:
+                dots *= self.scales[rows]
+            norms = self.norms[rows]
+            if space == "cosine":
+                distances = 1.0 - dots / np.maximum(np.sqrt(norms * query_norm), 1e-12)
+            elif space == "ip":
+                distances = 1.0 - dots
+            else:
+                distances = norms - 2.0 * dots + query_norm
+
+            # Keep only the running top-k
+            best_rows = np.concatenate([best_rows, rows])
+            best_distances = np.concatenate([best_distances, distances.astype(np.float32)])
+            if len(best_rows) > k:
+                keep = np.argpartition(best_distances, k - 1)[:k]
+                best_rows, best_distances = best_rows[keep], best_distances[keep]
+
+        order = np.argsort(best_distances, kind='stable')
+        return [(int(best_rows[i]), float(best_distances[i])) for i in order]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Search for similar documents using the query, optionally restricted by metadata filters
+        """
+        return [doc for doc, _ in self.similarity_search_with_scores(query, k, filters)]
+
+    def similarity_search_with_scores(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Like similarity_search, paired with the cosine similarity of each document to the query
+        """
+        if k is None:
+            k = config.MAX_RELEVANT_CHUNKS
+        if self.count_documents() == 0:
+            print("Warning: No documents in the snapshot")
+            return []
+
+        query_embedding = self.embedder.embed_query(query)
+        space = self.manifest["space"]
+        return [
+            (
+                Document(page_content=self.texts[row], metadata=self.get_metadata(row)),
+                similarity_from_distance(distance, space)
+            )
+            for row, distance in self.search_vectors(query_embedding, k, self.filter_mask(filters))
+        ]
+
+
+if __name__ == "__main__":
+    import argparse
+    from .vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Export the vector store to a memory-mapped snapshot")
+    parser.add_argument("path", help="Snapshot directory to write")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="float16")
+    args = parser.parse_args()
+    VectorStore().export_snapshot(args.path, args.quantization)
@@ -1,15 +1,47 @@
-from typing import List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
 from langchain.schema import Document
 import google.generativeai as genai
 from . import config
+from .embeddings import HashingEmbedder, similarity_from_distance
+from .snapshot import SnapshotIndex, embedder_settings, export_snapshot
+from .filters import build_where, matches, needs_post_filter
+from .index_registry import IndexRegistry
+from .sharding import (
+    bump_generation,
+    search_shards,
+    shard_collection_name,
+    shard_for_id
+)
 import uuid
 import time
 import os
 
+def hnsw_collection_metadata(
+    space: Optional[str] = None,
+    m: Optional[int] = None,
+    construction_ef: Optional[int] = None,
+    search_ef: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Chroma collection metadata that sets the HNSW index parameters (defaults from config)
+    """
+    return {
+        "hnsw:space": space or config.HNSW_SPACE,
+        "hnsw:M": m or config.HNSW_M,
+        "hnsw:construction_ef": construction_ef or config.HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": search_ef or config.HNSW_SEARCH_EF
+    }
+
+
 class VectorStore:
-    def __init__(self):
+    def __init__(self, collection_name: Optional[str] = None):
+        """
+        Args:
+            collection_name: Open this index build. By default the store opens the build
+                the registry alias points at and follows the alias when it is swapped.
+        """
         # Ensure the persistence directory exists
         os.makedirs(config.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
         
@@ -21,11 +53,32 @@ class VectorStore:
             )
         )
         
+        self.registry = IndexRegistry()
+        self.follow_alias = collection_name is None
+        self._open_collection(collection_name or self.registry.active_name())
+            
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+    
+    def _open_collection(self, name: str):
+        """
+        Open (or create) a collection, its shards and its embedder statistics.
+        
+        Builds are opened with the embedder and shard layout recorded for them in the
+        registry, so an active build keeps serving after the config changed and until
+        its replacement is swapped in. Legacy builds without settings use the config.
+        """
+        self.collection_name = name
+        build = self.registry.get_build(name)
+        settings = (build or {}).get("settings") or {}
+        self.embedder_name = settings.get("embedder", config.EMBEDDER)
+        self.hnsw_metadata = settings.get("hnsw") or hnsw_collection_metadata()
+        
         # Try to get existing collection or create new one
         try:
-            self.collection = self.client.get_collection("documents")
-            doc_count = self.count_documents()
-            print(f"Loaded existing collection with {doc_count} documents")
+            self.collection = self.client.get_collection(name)
+            doc_count = self.collection.count()
+            print(f"Loaded existing collection '{name}' with {doc_count} documents")
             if doc_count > 0:
                 # Print a sample document
                 sample = self.collection.get(limit=1)
@@ -33,17 +86,51 @@ class VectorStore:
                 print(f"Content: {sample['documents'][0][:200]}...")
                 print(f"Metadata: {sample['metadatas'][0]}")
         except:
-            print("Creating new collection 'documents'")
-            self.collection = self.client.create_collection("documents")
+            print(f"Creating new collection '{name}'")
+            self.collection = self.client.create_collection(name, metadata=self.hnsw_metadata)
             
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+        self.embedder = HashingEmbedder(
+            dimension=settings.get("embedding_dimension", config.EMBEDDING_DIMENSION),
+            ngram_range=settings.get("embedding_ngram_range", config.EMBEDDING_NGRAM_RANGE),
+            stats_path=os.path.join(config.EMBEDDER_STATS_DIRECTORY, f"{name}.npz")
+        )
+        
+        # Sharded mode: chunks live in num_shards collections searched in parallel
+        num_shards = settings.get("num_shards", config.NUM_SHARDS)
+        self.shards = []
+        if num_shards > 1:
+            self.shards = [
+                self.client.get_or_create_collection(
+                    shard_collection_name(name, shard),
+                    metadata=self.hnsw_metadata
+                )
+                for shard in range(num_shards)
+            ]
+            print(f"Sharded mode: {num_shards} shards with {self.count_documents()} documents")
+    
+    def refresh(self) -> bool:
+        """
+        Switch to the active build if the alias moved since we opened ours
+        
+        Returns:
+            bool: True if the store switched collections
+        """
+        if not self.follow_alias:
+            return False
+        active = self.registry.active_name()
+        if active == self.collection_name:
+            return False
+        print(f"Index alias now points at '{active}', switching from '{self.collection_name}'")
+        self._open_collection(active)
+        return True
     
     def count_documents(self) -> int:
         """
         Get the number of documents in the collection
         """
         try:
+            if self.shards:
+                return sum(shard.count() for shard in self.shards)
             return self.collection.count()
         except Exception:
             return 0
@@ -53,12 +140,84 @@ class VectorStore:
         Clear all documents from the database
         """
         try:
-            self.client.delete_collection("documents")
+            self.client.delete_collection(self.collection_name)
         except ValueError:
             pass  # Collection doesn't exist
-        self.collection = self.client.create_collection("documents")
+        self.collection = self.client.create_collection(
+            self.collection_name,
+            metadata=self.hnsw_metadata
+        )
+        
+        for shard in range(len(self.shards)):
+            name = shard_collection_name(self.collection_name, shard)
+            try:
+                self.client.delete_collection(name)
+            except ValueError:
+                pass
+            self.shards[shard] = self.client.create_collection(name, metadata=self.hnsw_metadata)
+        if self.shards:
+            bump_generation(config.CHROMA_PERSIST_DIRECTORY)
+        self.embedder.reset_stats()
         print("Database cleared")
     
+    def delete_collections(self):
+        """
+        Drop this build entirely: its collection, shards and embedder statistics
+        """
+        names = [self.collection_name] + [shard.name for shard in self.shards]
+        for name in names:
+            try:
+                self.client.delete_collection(name)
+            except ValueError:
+                pass
+        if self.shards:
+            bump_generation(config.CHROMA_PERSIST_DIRECTORY)
+        if os.path.exists(self.embedder.stats_path):
+            os.remove(self.embedder.stats_path)
+        print(f"Deleted collection '{self.collection_name}'")
+    
+    def export_snapshot(self, path: str, quantization: str = "float16"):
+        """
+        Export the collection to a memory-mapped snapshot for read-only query replicas
+        """
+        return export_snapshot(
+            self.shards or self.collection,
+            path,
+            quantization,
+            embedder_stats_path=self.embedder.stats_path,
+            embedder=embedder_settings(self.embedder, self.embedder_name)
+        )
+    
+    def import_snapshot(self, path: str, clear_db: bool = True, batch_size: int = 1000):
+        """
+        Load a snapshot back into the collection, e.g. to seed a new writable store
+        """
+        snapshot = SnapshotIndex(path)
+        expected = embedder_settings(self.embedder, self.embedder_name)
+        if snapshot.manifest["embedder"] != expected:
+            raise ValueError(
+                f"Snapshot {path} was built with embedder {snapshot.manifest['embedder']}, "
+                f"collection '{self.collection_name}' uses {expected}"
+            )
+        if clear_db:
+            self.clear_database()
+            # Adopt the document frequencies the snapshot's vectors were built with
+            self.embedder.doc_freq = snapshot.embedder.doc_freq.copy()
+            self.embedder.num_docs = snapshot.embedder.num_docs
+            self.embedder.save_stats()
+            
+        count = snapshot.count_documents()
+        for start in range(0, count, batch_size):
+            end = min(start + batch_size, count)
+            rows = range(start, end)
+            self._add_to_collections(
+                ids=[snapshot.ids[i] for i in rows],
+                embeddings=snapshot.get_vectors(start, end).tolist(),
+                documents=[snapshot.texts[i] for i in rows],
+                metadatas=[snapshot.get_metadata(i) for i in rows]
+            )
+        print(f"Imported {count} documents from snapshot {path}")
+    
     def _generate_unique_id(self) -> str:
         """
         Generate a unique ID for a document using UUID and timestamp
@@ -67,27 +226,48 @@ class VectorStore:
         unique_id = f"{timestamp}_{str(uuid.uuid4())[:8]}"
         return unique_id
     
+    def _add_to_collections(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """
+        Add records to the collection, or spread them over the shards by id hash
+        """
+        if not self.shards:
+            self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            return
+            
+        by_shard: Dict[int, List[int]] = {}
+        for i, doc_id in enumerate(ids):
+            by_shard.setdefault(shard_for_id(doc_id, len(self.shards)), []).append(i)
+        for shard, rows in by_shard.items():
+            self.shards[shard].add(
+                ids=[ids[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows],
+                documents=[documents[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows]
+            )
+        bump_generation(config.CHROMA_PERSIST_DIRECTORY)
+    
     def add_documents(self, documents: List[Document]):
         """
         Add documents to the vector store
         """
         # Prepare batches of documents
-        doc_contents = []
-        doc_embeddings = []
-        doc_metadatas = []
-        doc_ids = []
+        doc_contents = [doc.page_content for doc in documents]
+        doc_metadatas = [doc.metadata for doc in documents]
+        doc_ids = [self._generate_unique_id() for _ in documents]
         
-        for doc in documents:
-            embedding = self._get_simple_embedding(doc.page_content)
-            doc_contents.append(doc.page_content)
-            doc_embeddings.append(embedding)
-            doc_metadatas.append(doc.metadata)
-            doc_ids.append(self._generate_unique_id())
+        # Embed the whole batch at once
+        doc_embeddings = self.embedder.embed_documents(doc_contents).tolist() if doc_contents else []
         
         # Add documents in a single batch
         if doc_contents:
             try:
-                self.collection.add(
+                self._add_to_collections(
                     documents=doc_contents,
                     embeddings=doc_embeddings,
                     metadatas=doc_metadatas,
@@ -97,65 +277,93 @@ class VectorStore:
             except Exception as e:
                 print(f"Error adding documents to collection: {str(e)}")
     
-    def _get_simple_embedding(self, text: str, vector_size: int = 384) -> List[float]:
-        """
-        Create a simple deterministic embedding from text.
-        Using a smaller vector size (384) for better similarity matching.
+    def similarity_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
         """
-        import hashlib
-        import numpy as np
-        
-        # Create a deterministic hash of the text
-        text_hash = hashlib.sha256(text.encode()).hexdigest()
-        
-        # Use the hash to seed numpy's random number generator
-        np.random.seed(int(text_hash[:8], 16))
-        
-        # Generate a random vector
-        embedding = np.random.uniform(-1, 1, vector_size)
-        
-        # Normalize the vector
-        embedding = embedding / np.linalg.norm(embedding)
+        Search for similar documents using the query
         
-        return embedding.tolist()
+        Args:
+            query: The search query
+            k: Number of documents to return (defaults to MAX_RELEVANT_CHUNKS)
+            filters: Optional metadata filters (see rag.filters), pushed down into the vector query
+        """
+        return [doc for doc, _ in self.similarity_search_with_scores(query, k, filters)]
     
-    def similarity_search(self, query: str, k: Optional[int] = None) -> List[Document]:
+    def similarity_search_with_scores(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
         """
-        Search for similar documents using the query
+        Like similarity_search, paired with the cosine similarity of each document to the query
         """
         if k is None:
             k = config.MAX_RELEVANT_CHUNKS
             
-        if self.count_documents() == 0:
+        self.refresh()
+        doc_count = self.count_documents()
+        if doc_count == 0:
             print("Warning: No documents in the database")
             return []
             
         try:
-            # Get all documents first to inspect what we have
-            all_docs = self.collection.get()
-            print(f"\nTotal documents in database: {len(all_docs['documents'])}")
+            print(f"\nTotal documents in database: {doc_count}")
+            
+            where = build_where(filters)
+            post_filter = needs_post_filter(filters)
+            # Over-fetch when part of the filter can only be checked on the results
+            n_results = k * 4 if post_filter else k
             
             # Perform the search
-            query_embedding = self._get_simple_embedding(query)
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(k, self.count_documents())
-            )
+            query_embedding = self.embedder.embed_query(query)
+            if self.shards:
+                hits = search_shards(
+                    config.CHROMA_PERSIST_DIRECTORY,
+                    # Shards are pinned to workers, so workers beyond the shard count would idle
+                    min(config.SHARD_SEARCH_WORKERS, len(self.shards)),
+                    [shard.name for shard in self.shards],
+                    query_embedding,
+                    n_results,
+                    where
+                )
+                result_distances = [hit[0] for hit in hits]
+                result_documents = [hit[1] for hit in hits]
+                result_metadatas = [hit[2] for hit in hits]
+                space = (self.shards[0].metadata or {}).get("hnsw:space", "l2")
+            else:
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=min(n_results, doc_count),
+                    where=where
+                )
+                result_distances = results['distances'][0] if results['distances'] else []
+                result_documents = results['documents'][0] if results['documents'] else []
+                result_metadatas = results['metadatas'][0] if results['metadatas'] else []
+                space = (self.collection.metadata or {}).get("hnsw:space", "l2")
             
             documents = []
-            if results['documents'] and len(results['documents'][0]) > 0:
-                for i in range(len(results['documents'][0])):
+            if result_documents:
+                for i in range(len(result_documents)):
                     doc = Document(
-                        page_content=results['documents'][0][i],
-                        metadata=results['metadatas'][0][i]
+                        page_content=result_documents[i],
+                        metadata=result_metadatas[i]
                     )
-                    documents.append(doc)
+                    if post_filter and not matches(doc.metadata, filters):
+                        continue
+                    documents.append((doc, similarity_from_distance(result_distances[i], space)))
+                documents = documents[:k]
                     
                 # Print debug information
                 print(f"\nFound {len(documents)} relevant documents:")
-                for i, doc in enumerate(documents, 1):
+                for i, (doc, score) in enumerate(documents, 1):
                     print(f"\nDocument {i}:")
                     print(f"URL: {doc.metadata.get('url', 'unknown')}")
+                    print(f"Score: {score:.3f}")
                     print(f"Content length: {len(doc.page_content)} characters")
                     print(f"Content preview: {doc.page_content[:500]}...")
             else:
@@ -163,7 +371,10 @@ class VectorStore:
                 
             return documents
         except Exception as e:
+            # The build we were reading may have been swapped out and deleted mid-query
+            if self.refresh():
+                return self.similarity_search_with_scores(query, k, filters)
             print(f"Error during similarity search: {str(e)}")
             import traceback
             print(f"Traceback: {traceback.format_exc()}")
-            return [] 
\ No newline at end of file
+            return []
\ No newline at end of file
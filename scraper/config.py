@@ -0,0 +1,45 @@
+"""
+Scraper configuration: politeness and crawl concurrency defaults.
+"""
+
+# User agent used when reading robots.txt rules
+USER_AGENT = "*"
+RESPECT_ROBOTS_TXT = True
+ROBOTS_TXT_TIMEOUT = 10  # seconds
+
+# Per-host token bucket (ceiling; lowered automatically on throttling or crawl-delay)
+RATE_LIMIT_REQUESTS_PER_SECOND = 4.0
+RATE_LIMIT_BURST = 4
+
+# Per-host AIMD concurrency window
+MIN_CONCURRENCY_PER_HOST = 1
+MAX_CONCURRENCY_PER_HOST = 8
+INITIAL_CONCURRENCY_PER_HOST = 2
+AIMD_ADDITIVE_INCREASE = 1.0  # Window grows by roughly this much per window of successes
+AIMD_MULTIPLICATIVE_DECREASE = 0.5  # Window and rate are scaled by this on back-off
+
+# Latency is "rising" once its moving average exceeds the baseline by this factor
+LATENCY_TOLERANCE = 2.0
+LATENCY_EWMA_ALPHA = 0.2
+
+# Back-off when a host throttles us without sending Retry-After
+DEFAULT_BACKOFF_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 300.0
+
+# How often a throttled (429/503) request is retried before giving up
+MAX_THROTTLE_RETRIES = 3
+
+# Crawl journal (resume after crash)
+CRAWL_JOURNAL_DIRECTORY = "crawl_journals"
+JOURNAL_FSYNC = True  # fsync after every page so a crash loses at most the page in flight
+
+# Shared HTTP connection pool (sitemaps, robots.txt)
+HTTP_POOL_SIZE = 100  # Connections across all hosts
+HTTP_CONNECTIONS_PER_HOST = MAX_CONCURRENCY_PER_HOST
+HTTP_DNS_CACHE_TTL = 300  # seconds
+HTTP_KEEPALIVE_TIMEOUT = 30  # seconds an idle connection is kept for reuse
+HTTP_TIMEOUT = 30  # seconds per request
+
+# Sitemap discovery
+DEFAULT_INCLUDE_PATHS = ['/api/', '/examples/', '/guide/']
+MAX_SITEMAP_DEPTH = 3  # Nesting levels followed through sitemap index files
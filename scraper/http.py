@@ -0,0 +1,79 @@
+"""
+Shared, long-lived HTTP connection pool.
+
+All sitemap and robots.txt fetches in a process go through one aiohttp session
+per event loop, so connections, DNS lookups and TLS sessions are reused across
+requests and across sites crawled concurrently.
+"""
+import asyncio
+import weakref
+import aiohttp
+from . import config
+
+# Keyed weakly like the rate limiter registries. A session references its loop, so
+# entries are also dropped when the loop shuts down (see _close_at_shutdown).
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+_closers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+async def _close_at_shutdown(loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession):
+    """
+    Async generator that closes a loop's session when the loop finalizes its async
+    generators, which asyncio.run() does before closing the loop
+    """
+    try:
+        yield
+    finally:
+        if _sessions.get(loop) is session:
+            _sessions.pop(loop, None)
+            _closers.pop(loop, None)
+        if not session.closed:
+            await session.close()
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Get the shared session of the running event loop, creating it on first use.
+    Must be called from a coroutine.
+
+    Callers don't have to close it: it is closed when the loop shuts down its
+    async generators, or earlier with close_session.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        # Forget sessions of loops that were closed without shutting down their async generators
+        for other in [other for other in _sessions if other.is_closed()]:
+            _sessions.pop(other, None)
+            _closers.pop(other, None)
+
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_POOL_SIZE,
+            limit_per_host=config.HTTP_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT)
+        )
+        _sessions[loop] = session
+        closer = _close_at_shutdown(loop, session)
+        _closers[loop] = closer
+        # Start the generator so the loop tracks it for shutdown_asyncgens()
+        asyncio.ensure_future(closer.__anext__())
+    return session
+
+
+async def close_session():
+    """
+    Close the shared session of the running event loop, e.g. before the loop shuts down
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.pop(loop, None)
+    closer = _closers.pop(loop, None)
+    if closer is not None:
+        await closer.aclose()
+    if session is not None and not session.closed:
+        await session.close()
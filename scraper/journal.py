@@ -0,0 +1,101 @@
+"""
+On-disk crawl journal used to resume interrupted crawls.
+
+Every page result is appended to a JSONL file as soon as it completes, so a
+crawl that dies part-way through can skip the pages it already finished and
+ingest them straight from the journal.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict
+from urllib.parse import urlparse
+from . import config
+
+
+class CrawlJournal:
+    """Append-only JSONL journal of crawl results for one sitemap."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @classmethod
+    def for_sitemap(cls, sitemap_url: str) -> "CrawlJournal":
+        """
+        Get the journal for a sitemap URL, stored under CRAWL_JOURNAL_DIRECTORY.
+        """
+        host = urlparse(sitemap_url).netloc.replace(':', '_') or 'site'
+        digest = hashlib.sha1(sitemap_url.encode()).hexdigest()[:12]
+        return cls(os.path.join(config.CRAWL_JOURNAL_DIRECTORY, f"{host}_{digest}.jsonl"))
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Read all recorded results, keyed by URL. Later entries win.
+
+        A torn last line (the process died mid-write) is ignored.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return results
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping corrupt journal entry in {self.path}")
+                    continue
+                if 'url' in record:
+                    results[record['url']] = record
+        return results
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get results of pages that were crawled successfully, keyed by URL.
+        """
+        return {
+            url: record for url, record in self.load().items()
+            if record.get('status') == 'success'
+        }
+
+    def append(self, result: Dict[str, Any]):
+        """
+        Durably append one page result to the journal.
+        """
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._ends_mid_line():
+                # Start after a line torn by a crash, or this entry would be lost with it
+                self._file.write('\n')
+        self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if config.JOURNAL_FSYNC:
+            os.fsync(self._file.fileno())
+
+    def _ends_mid_line(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """
+        Delete the journal once its results have been ingested.
+        """
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
@@ -0,0 +1,354 @@
+"""
+Adaptive per-host rate limiting for crawling.
+
+Every host gets a token bucket that caps requests per second, combined with an
+AIMD (additive increase, multiplicative decrease) concurrency window. The window
+grows while response latency stays near the host's baseline and is cut back on
+429/503 responses or rising latency. Retry-After headers and robots.txt
+crawl-delay / request-rate directives are honoured.
+"""
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Mapping, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import aiohttp
+from . import config
+from .http import get_session
+
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value into a number of seconds.
+
+    Args:
+        value: Header value, either delta-seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the value is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def retry_after_from_headers(headers: Optional[Mapping[str, Any]]) -> Optional[float]:
+    """
+    Look up and parse Retry-After from a (case-insensitive or plain) header mapping.
+    """
+    if not headers:
+        return None
+    for name, value in headers.items():
+        if name.lower() == 'retry-after':
+            return parse_retry_after(str(value))
+    return None
+
+
+class HostRateLimiter:
+    """Token bucket plus AIMD concurrency window for a single host."""
+
+    def __init__(
+        self,
+        host: str,
+        rate: float = config.RATE_LIMIT_REQUESTS_PER_SECOND,
+        burst: int = config.RATE_LIMIT_BURST,
+        min_concurrency: int = config.MIN_CONCURRENCY_PER_HOST,
+        max_concurrency: int = config.MAX_CONCURRENCY_PER_HOST,
+        initial_concurrency: int = config.INITIAL_CONCURRENCY_PER_HOST
+    ):
+        self.host = host
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self.in_flight = 0
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._baseline_latency: Optional[float] = None
+        self._latency_ewma: Optional[float] = None
+        self._condition = asyncio.Condition()
+
+    def set_crawl_delay(self, delay: Optional[float]):
+        """
+        Apply a robots.txt crawl-delay by lowering the rate ceiling to one request per delay.
+        """
+        if not delay or delay <= 0:
+            return
+        self.max_rate = min(self.max_rate, 1.0 / delay)
+        self.rate = min(self.rate, self.max_rate)
+        self.burst = 1
+        self._tokens = min(self._tokens, 1.0)
+        print(f"Honouring crawl-delay of {delay:.2f}s for {self.host}")
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free concurrency slot and a token.
+
+        Returns:
+            float: Monotonic start time, to be passed back to release()
+        """
+        async with self._condition:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.in_flight >= int(self.concurrency):
+                    wait = None  # Woken up by release()
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        self.in_flight += 1
+                        return time.monotonic()
+                    wait = (1.0 - self._tokens) / self.rate
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(
+        self,
+        started: float,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        """
+        Return a slot and feed the outcome of the request back into the controller.
+
+        Args:
+            started: Value returned by acquire()
+            status: HTTP status of the response, if any
+            retry_after: Seconds requested by a Retry-After header, if any
+        """
+        latency = time.monotonic() - started
+        async with self._condition:
+            self.in_flight -= 1
+            if status in THROTTLE_STATUSES or retry_after is not None:
+                self._on_throttle(retry_after)
+            else:
+                self._on_latency(latency)
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Context manager around acquire()/release().
+
+        Yields a dict in which the caller records "status" and "retry_after"
+        of the response so the limiter can adapt.
+        """
+        started = await self.acquire()
+        outcome: Dict[str, Any] = {"status": None, "retry_after": None}
+        try:
+            yield outcome
+        finally:
+            await self.release(started, outcome["status"], outcome["retry_after"])
+
+    def _on_latency(self, latency: float):
+        if self._baseline_latency is None:
+            self._baseline_latency = latency
+            self._latency_ewma = latency
+        else:
+            alpha = config.LATENCY_EWMA_ALPHA
+            self._latency_ewma = alpha * latency + (1 - alpha) * self._latency_ewma
+            # Track the fastest latency seen, letting it drift up slowly so a host
+            # that became permanently slower does not keep us backed off forever
+            self._baseline_latency = min(latency, self._baseline_latency * 1.01)
+
+        if self._latency_ewma > self._baseline_latency * config.LATENCY_TOLERANCE:
+            self._decrease()
+            return
+
+        # Additive increase: roughly +AIMD_ADDITIVE_INCREASE per window of successes
+        self.concurrency = min(
+            self.max_concurrency,
+            self.concurrency + config.AIMD_ADDITIVE_INCREASE / self.concurrency
+        )
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def _on_throttle(self, retry_after: Optional[float]):
+        backoff = retry_after if retry_after is not None else config.DEFAULT_BACKOFF_SECONDS
+        backoff = min(backoff, config.MAX_BACKOFF_SECONDS)
+        self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+        print(f"Host {self.host} is throttling requests, backing off for {backoff:.1f}s")
+        self._decrease()
+
+    def _decrease(self):
+        # Responses to requests sent in the same window report the same congestion
+        # event, so only back off once per window
+        now = time.monotonic()
+        cooldown = max(self._latency_ewma or 0.0, 1.0)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        factor = config.AIMD_MULTIPLICATIVE_DECREASE
+        self.concurrency = max(self.min_concurrency, self.concurrency * factor)
+        self.rate = max(self.max_rate * 0.05, self.rate * factor)
+        self._tokens = min(self._tokens, 1.0)
+
+
+def parse_crawl_delay(robots_content: str, user_agent: str) -> Optional[float]:
+    """
+    Read the Crawl-delay for a user agent from robots.txt content.
+
+    RobotFileParser only accepts integer delays, but fractional ones such as
+    "Crawl-delay: 0.5" are common. Groups are matched like RobotFileParser does:
+    a group naming our agent wins over the "*" group.
+
+    Returns:
+        Delay in seconds, or None if no matching group sets a valid one
+    """
+    agent = user_agent.split('/')[0].lower()
+    specific: Optional[float] = None
+    default: Optional[float] = None
+    group_agents: List[str] = []
+    in_rules = False
+    for line in robots_content.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = (part.strip() for part in line.split(':', 1))
+        field = field.lower()
+        if field == 'user-agent':
+            if in_rules:
+                group_agents, in_rules = [], False
+            group_agents.append(value.lower())
+            continue
+        in_rules = True
+        if field != 'crawl-delay':
+            continue
+        try:
+            delay = float(value)
+        except ValueError:
+            continue
+        if delay < 0:
+            continue
+        for group_agent in group_agents:
+            if group_agent == '*':
+                if default is None:
+                    default = delay
+            elif group_agent in agent and specific is None:
+                specific = delay
+    return specific if specific is not None else default
+
+
+async def fetch_robots_delay(
+    base_url: str,
+    session: Optional[aiohttp.ClientSession] = None
+) -> Optional[float]:
+    """
+    Read crawl-delay (or request-rate) for our user agent from a host's robots.txt.
+
+    Args:
+        base_url: Scheme and host of the site, e.g. https://example.com
+        session: Session to use (defaults to the shared connection pool)
+
+    Returns:
+        Delay between requests in seconds, or None if robots.txt does not specify one
+    """
+    robots_url = f"{base_url}/robots.txt"
+    if session is None:
+        session = get_session()
+    try:
+        timeout = aiohttp.ClientTimeout(total=config.ROBOTS_TXT_TIMEOUT)
+        async with session.get(robots_url, timeout=timeout) as response:
+            if response.status != 200:
+                return None
+            robots_content = await response.text()
+    except Exception as e:
+        print(f"Could not read {robots_url}: {str(e)}")
+        return None
+
+    parser = RobotFileParser()
+    parser.parse(robots_content.splitlines())
+
+    delays = []
+    crawl_delay = parse_crawl_delay(robots_content, config.USER_AGENT)
+    if crawl_delay:
+        delays.append(float(crawl_delay))
+    request_rate = parser.request_rate(config.USER_AGENT)
+    if request_rate and request_rate.requests:
+        delays.append(request_rate.seconds / request_rate.requests)
+    return max(delays) if delays else None
+
+
+class RateLimiterRegistry:
+    """Hands out one shared HostRateLimiter per host."""
+
+    def __init__(self):
+        self._limiters: Dict[str, "asyncio.Future[HostRateLimiter]"] = {}
+
+    async def for_url(
+        self,
+        url: str,
+        session: Optional[aiohttp.ClientSession] = None
+    ) -> HostRateLimiter:
+        """
+        Get the limiter for the host of a URL, reading robots.txt on first use.
+
+        Args:
+            url: Any URL on the host
+            session: Session for the robots.txt request (defaults to the shared connection pool)
+
+        Returns:
+            HostRateLimiter: The limiter shared by all requests to that host
+        """
+        parsed = urlparse(url)
+        host = parsed.netloc
+        pending = self._limiters.get(host)
+        if pending is None:
+            # Store the future before awaiting so concurrent callers share one robots.txt fetch
+            pending = asyncio.ensure_future(self._create(f"{parsed.scheme}://{host}", host, session))
+            self._limiters[host] = pending
+        return await asyncio.shield(pending)
+
+    async def _create(
+        self,
+        base_url: str,
+        host: str,
+        session: Optional[aiohttp.ClientSession]
+    ) -> HostRateLimiter:
+        limiter = HostRateLimiter(host)
+        if config.RESPECT_ROBOTS_TXT:
+            limiter.set_crawl_delay(await fetch_robots_delay(base_url, session))
+        return limiter
+
+
+# Limiters hold asyncio primitives bound to the loop that created them, so every
+# event loop (e.g. each asyncio.run() of a scraping job) gets its own registry
+_registries: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, RateLimiterRegistry]" = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiters() -> RateLimiterRegistry:
+    """
+    Get the registry shared by sitemap discovery and the crawl loop of the running
+    event loop, creating it on first use. Must be called from a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    registry = _registries.get(loop)
+    if registry is None:
+        registry = RateLimiterRegistry()
+        _registries[loop] = registry
+    return registry
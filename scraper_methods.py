@@ -1,21 +1,213 @@
 from crawl4ai import AsyncWebCrawler
 from crawl4ai.async_configs import BrowserConfig, CrawlerRunConfig
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import xml.etree.ElementTree as ET
 import aiohttp
 from urllib.parse import urlparse
+import asyncio
 from rag.rag_engine import RAGEngine
+from scraper import config as scraper_config
+from scraper.rate_limiter import (
+    RateLimiterRegistry,
+    THROTTLE_STATUSES,
+    get_rate_limiters,
+    retry_after_from_headers
+)
+from scraper.journal import CrawlJournal
+from scraper.http import get_session
+
+async def _fetch_text(
+    session: aiohttp.ClientSession,
+    url: str,
+    rate_limiters: RateLimiterRegistry
+) -> Optional[str]:
+    """
+    Fetch a URL through its host's rate limiter, retrying while the host throttles us.
+    
+    Returns:
+        The response body, or None if the request did not succeed
+    """
+    limiter = await rate_limiters.for_url(url, session)
+    for attempt in range(scraper_config.MAX_THROTTLE_RETRIES + 1):
+        async with limiter.slot() as outcome:
+            async with session.get(url) as response:
+                outcome["status"] = response.status
+                outcome["retry_after"] = retry_after_from_headers(response.headers)
+                if response.status == 200:
+                    return await response.text()
+                    
+        if response.status in THROTTLE_STATUSES and attempt < scraper_config.MAX_THROTTLE_RETRIES:
+            print(f"Throttled while fetching {url} (HTTP {response.status}), retrying")
+            continue
+        print(f"Failed to fetch {url}: HTTP {response.status}")
+        return None
+
+# Sitemap XML namespaces
+SITEMAP_NAMESPACES = {
+    'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9',
+    'image': 'http://www.google.com/schemas/sitemap-image/1.1'
+}
+
+def _path_segments(path: str) -> List[str]:
+    return [segment for segment in path.split('/') if segment]
+
+def _path_matches(segments: List[str], pattern: str) -> bool:
+    """
+    Whether the segments of a pattern such as '/api/' appear as whole, consecutive
+    segments of a path, so '/api/' matches '/v2/api/models' but not '/rapid-start/'
+    """
+    pattern_segments = _path_segments(pattern)
+    if not pattern_segments:
+        return False
+    width = len(pattern_segments)
+    return any(
+        segments[start:start + width] == pattern_segments
+        for start in range(len(segments) - width + 1)
+    )
+
+def _classify_path(
+    path: str,
+    include_paths: List[str],
+    exclude_paths: List[str]
+) -> Optional[str]:
+    """
+    Decide whether a page path is wanted and which content type it belongs to.
+    
+    Returns:
+        The content type, or None to skip the URL
+    """
+    segments = _path_segments(path)
+    for exclude_path in exclude_paths:
+        if _path_matches(segments, exclude_path):
+            return None
+            
+    if not include_paths:
+        # Include everything, typed by the first path segment
+        return segments[0] if segments else 'page'
+        
+    for include_path in include_paths:
+        if _path_matches(segments, include_path):
+            return include_path.strip('/')
+    return None
+
+def _parse_sitemap_urls(
+    root: ET.Element,
+    include_paths: List[str],
+    exclude_paths: List[str]
+) -> List[Dict[str, Any]]:
+    """
+    Extract structured URL entries (with images) from a parsed <urlset> sitemap.
+    """
+    structured_urls = []
+    
+    # Look for URLs in sitemap
+    for url_elem in root.findall('.//sm:url', SITEMAP_NAMESPACES):
+        # Get the main URL
+        loc_elem = url_elem.find('sm:loc', SITEMAP_NAMESPACES)
+        if loc_elem is None or not loc_elem.text:
+            continue
+            
+        url = loc_elem.text.strip()
+        
+        # Skip sitemap XML files
+        if url.endswith('sitemap.xml'):
+            continue
+        
+        # Check if URL matches the include/exclude paths
+        path = urlparse(url).path
+        url_type = _classify_path(path, include_paths, exclude_paths)
+        if url_type is None:
+            continue  # Skip URLs that don't match include paths
+        
+        # Extract images for this URL
+        images = []
+        for img_elem in url_elem.findall('.//image:image', SITEMAP_NAMESPACES):
+            image_data = {}
+            
+            # Get image URL
+            img_loc = img_elem.find('image:loc', SITEMAP_NAMESPACES)
+            if img_loc is not None and img_loc.text:
+                image_data['url'] = img_loc.text
+                
+                # Get optional image metadata
+                img_title = img_elem.find('image:title', SITEMAP_NAMESPACES)
+                if img_title is not None and img_title.text:
+                    image_data['title'] = img_title.text
+                    
+                img_caption = img_elem.find('image:caption', SITEMAP_NAMESPACES)
+                if img_caption is not None and img_caption.text:
+                    image_data['alt'] = img_caption.text
+                    
+                images.append(image_data)
+        
+        # Create structured data for this URL
+        structured_urls.append({
+            'url': url,
+            'type': url_type,
+            'path': path,
+            'source': 'sitemap',
+            'images': images
+        })
+    return structured_urls
+
+async def _extract_from_sitemap(
+    session: aiohttp.ClientSession,
+    sitemap_url: str,
+    include_paths: List[str],
+    exclude_paths: List[str],
+    rate_limiters: RateLimiterRegistry,
+    depth: int = 0
+) -> List[Dict[str, Any]]:
+    sitemap_content = await _fetch_text(session, sitemap_url, rate_limiters)
+    if sitemap_content is None:
+        return []
+        
+    root = ET.fromstring(sitemap_content)
+    
+    # A sitemap index lists further sitemaps; fetch them concurrently over the shared pool
+    if root.tag.endswith('sitemapindex'):
+        if depth >= scraper_config.MAX_SITEMAP_DEPTH:
+            print(f"Not following sitemap index {sitemap_url}: nested too deeply")
+            return []
+        child_urls = [
+            loc.text.strip() for loc in root.findall('sm:sitemap/sm:loc', SITEMAP_NAMESPACES)
+            if loc.text
+        ]
+        print(f"Sitemap index {sitemap_url} lists {len(child_urls)} sitemaps")
+        children = await asyncio.gather(*(
+            _extract_from_sitemap(session, child_url, include_paths, exclude_paths, rate_limiters, depth + 1)
+            for child_url in child_urls
+        ), return_exceptions=True)
+        
+        structured_urls = []
+        for child_url, child in zip(child_urls, children):
+            if isinstance(child, Exception):
+                # One broken child sitemap must not cost us the pages of the others
+                print(f"Error processing sitemap {child_url}: {str(child)}")
+                continue
+            structured_urls.extend(child)
+        return structured_urls
+        
+    return _parse_sitemap_urls(root, include_paths, exclude_paths)
 
 async def extract_urls_from_sitemap(
     sitemap_url: str,
-    include_paths: List[str] = ['/api/', '/examples/', '/guide/']
+    include_paths: Optional[List[str]] = None,
+    rate_limiters: Optional[RateLimiterRegistry] = None,
+    exclude_paths: Optional[List[str]] = None
 ) -> List[Dict[str, Any]]:
     """
     Extract structured data from a sitemap including URLs, types, and images.
     
+    Sitemap index files are followed. All requests go through the shared
+    connection pool and the per-host rate limiters.
+    
     Args:
         sitemap_url: URL of the sitemap to process
-        include_paths: List of paths to include (e.g., ['/api/', '/guide/'])
+        include_paths: List of paths to include (e.g., ['/api/', '/guide/']); defaults to
+            DEFAULT_INCLUDE_PATHS, an empty list includes every URL
+        rate_limiters: Per-host rate limiters (defaults to the registry of the running event loop)
+        exclude_paths: List of paths to skip even if they match include_paths
         
     Returns:
         List of dictionaries containing:
@@ -25,98 +217,153 @@ async def extract_urls_from_sitemap(
         - source: Source of the URL (sitemap)
         - images: List of image dictionaries with url, alt, and title
     """
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(sitemap_url) as response:
-                if response.status != 200:
-                    print(f"Failed to fetch sitemap: HTTP {response.status}")
-                    return []
-                    
-                sitemap_content = await response.text()
-                root = ET.fromstring(sitemap_content)
-                
-                # Register XML namespaces
-                namespaces = {
-                    'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9',
-                    'image': 'http://www.google.com/schemas/sitemap-image/1.1'
-                }
-                
-                # Extract URLs with metadata
-                structured_urls = []
-                
-                # Look for URLs in sitemap
-                for url_elem in root.findall('.//sm:url', namespaces):
-                    # Get the main URL
-                    loc_elem = url_elem.find('sm:loc', namespaces)
-                    if loc_elem is None or not loc_elem.text:
-                        continue
-                        
-                    url = loc_elem.text
-                    
-                    # Skip sitemap XML files
-                    if url.endswith('sitemap.xml'):
-                        continue
-                    
-                    # Check if URL matches any of the include paths
-                    path = urlparse(url).path
-                    url_type = None
-                    for include_path in include_paths:
-                        if include_path.strip('/') in path:
-                            url_type = include_path.strip('/')
-                            break
-                    
-                    if url_type is None:
-                        continue  # Skip URLs that don't match include paths
-                    
-                    # Extract images for this URL
-                    images = []
-                    for img_elem in url_elem.findall('.//image:image', namespaces):
-                        image_data = {}
-                        
-                        # Get image URL
-                        img_loc = img_elem.find('image:loc', namespaces)
-                        if img_loc is not None and img_loc.text:
-                            image_data['url'] = img_loc.text
-                            
-                            # Get optional image metadata
-                            img_title = img_elem.find('image:title', namespaces)
-                            if img_title is not None and img_title.text:
-                                image_data['title'] = img_title.text
-                                
-                            img_caption = img_elem.find('image:caption', namespaces)
-                            if img_caption is not None and img_caption.text:
-                                image_data['alt'] = img_caption.text
-                                
-                            images.append(image_data)
-                    
-                    # Create structured data for this URL
-                    structured_urls.append({
-                        'url': url,
-                        'type': url_type,
-                        'path': path,
-                        'source': 'sitemap',
-                        'images': images
-                    })
-                
-                print(f"Found {len(structured_urls)} matching URLs in sitemap")
-                return structured_urls
+    if include_paths is None:
+        include_paths = scraper_config.DEFAULT_INCLUDE_PATHS
+    if rate_limiters is None:
+        rate_limiters = get_rate_limiters()
+        
+    try:
+        structured_urls = await _extract_from_sitemap(
+            get_session(),
+            sitemap_url,
+            include_paths,
+            exclude_paths or [],
+            rate_limiters
+        )
+        
+        # The same page can be listed by several sitemaps of an index
+        unique_urls = list({url_data['url']: url_data for url_data in structured_urls}.values())
+        print(f"Found {len(unique_urls)} matching URLs in sitemap")
+        return unique_urls
+        
+    except Exception as e:
+        print(f"Error processing sitemap: {str(e)}")
+        return []
+
+async def discover_sites(
+    sites: List[Dict[str, Any]],
+    rate_limiters: Optional[RateLimiterRegistry] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Discover the pages of several sites concurrently.
+    
+    Args:
+        sites: One dict per site with "sitemap_url" and optional "include_paths"
+            and "exclude_paths" (same meaning as in extract_urls_from_sitemap)
+        rate_limiters: Per-host rate limiters (defaults to the registry of the running event loop)
+        
+    Returns:
+        Dict mapping each sitemap URL to its structured URLs
+    """
+    results = await asyncio.gather(*(
+        extract_urls_from_sitemap(
+            site['sitemap_url'],
+            include_paths=site.get('include_paths'),
+            rate_limiters=rate_limiters,
+            exclude_paths=site.get('exclude_paths')
+        )
+        for site in sites
+    ))
+    return {site['sitemap_url']: urls for site, urls in zip(sites, results)}
+
+async def _crawl_url(
+    crawler: AsyncWebCrawler,
+    url_data: Dict[str, Any],
+    run_config: CrawlerRunConfig,
+    rate_limiters: RateLimiterRegistry
+) -> Dict[str, Any]:
+    """
+    Crawl a single URL through its host's rate limiter and build its result entry.
+    """
+    try:
+        limiter = await rate_limiters.for_url(url_data['url'])
+        for attempt in range(scraper_config.MAX_THROTTLE_RETRIES + 1):
+            async with limiter.slot() as outcome:
+                result = await crawler.arun(url=url_data['url'], config=run_config)
+                outcome["status"] = getattr(result, 'status_code', None)
+                outcome["retry_after"] = retry_after_from_headers(getattr(result, 'response_headers', None))
                 
-        except Exception as e:
-            print(f"Error processing sitemap: {str(e)}")
-            return []
+            if outcome["status"] in THROTTLE_STATUSES and attempt < scraper_config.MAX_THROTTLE_RETRIES:
+                print(f"Throttled while crawling {url_data['url']} (HTTP {outcome['status']}), retrying")
+                continue
+            break
+            
+        if result.success and result.markdown:
+            # Print detailed content preview for debugging
+            print(f"\nSuccessfully crawled: {url_data['url']}")
+            print(f"Content type: {url_data['type']}")
+            print(f"Content length: {len(result.markdown)} characters")
+            print("Content preview:")
+            print("-" * 50)
+            print(result.markdown[:500])
+            print("-" * 50)
+            
+            return {
+                **url_data,  # Include all metadata from structured_urls
+                "content": result.markdown,
+                "status": "success"
+            }
+            
+        print(f"Failed to crawl {url_data['url']}: {result.error_message if result.error_message else 'No content extracted'}")
+        return {
+            **url_data,
+            "content": None,
+            "status": "failed",
+            "error": result.error_message if result.error_message else "No content extracted"
+        }
+    except Exception as e:
+        print(f"Error crawling {url_data['url']}: {str(e)}")
+        return {
+            **url_data,
+            "content": None,
+            "status": "error",
+            "error": str(e)
+        }
 
-async def crawl_sitemap(sitemap_url: str) -> List[Dict[str, Any]]:
+async def crawl_sitemap(
+    sitemap_url: str,
+    rate_limiters: Optional[RateLimiterRegistry] = None,
+    journal: Optional[CrawlJournal] = None,
+    include_paths: Optional[List[str]] = None,
+    exclude_paths: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
     """
     Crawl a website's sitemap and extract content from each URL.
-    """
-    results = []
     
+    URLs are crawled concurrently; each host's rate limiter decides how many
+    requests are in flight and how fast new ones are started.
+    
+    Args:
+        sitemap_url: URL of the sitemap to crawl
+        rate_limiters: Per-host rate limiters (defaults to the registry of the running event loop)
+        journal: Optional journal; pages it already holds successfully are not
+            crawled again, and every newly crawled page is appended to it
+        include_paths: Paths to crawl (see extract_urls_from_sitemap)
+        exclude_paths: Paths to skip (see extract_urls_from_sitemap)
+    """
+    if rate_limiters is None:
+        rate_limiters = get_rate_limiters()
+        
+    completed = journal.completed() if journal else {}
+    if completed:
+        print(f"Resuming crawl: {len(completed)} pages already in journal {journal.path}")
+        
     # First extract all URLs from the sitemap with metadata
-    structured_urls = await extract_urls_from_sitemap(sitemap_url)
+    structured_urls = await extract_urls_from_sitemap(
+        sitemap_url,
+        include_paths=include_paths,
+        rate_limiters=rate_limiters,
+        exclude_paths=exclude_paths
+    )
     print(f"Found {len(structured_urls)} documentation URLs in sitemap")
     
     if not structured_urls:
-        return results
+        # The sitemap may only be unreachable for now: keep the journal for the next attempt
+        # rather than replacing the index with the pages an earlier run finished
+        return []
+    
+    pending_urls = [url_data for url_data in structured_urls if url_data['url'] not in completed]
+    print(f"{len(pending_urls)} URLs left to crawl")
     
     # Initialize crawler with configs
     browser_config = BrowserConfig(verbose=True)
@@ -125,51 +372,51 @@ async def crawl_sitemap(sitemap_url: str) -> List[Dict[str, Any]]:
         remove_overlay_elements=True
     )
     
+    async def crawl_and_record(url_data: Dict[str, Any]) -> Dict[str, Any]:
+        result = await _crawl_url(crawler, url_data, run_config, rate_limiters)
+        if journal:
+            journal.append(result)
+        return result
+    
     # Crawl each URL
-    async with AsyncWebCrawler(config=browser_config) as crawler:
-        for url_data in structured_urls:
-            try:
-                result = await crawler.arun(url=url_data['url'], config=run_config)
-                if result.success and result.markdown:
-                    # Print detailed content preview for debugging
-                    print(f"\nSuccessfully crawled: {url_data['url']}")
-                    print(f"Content type: {url_data['type']}")
-                    print(f"Content length: {len(result.markdown)} characters")
-                    print("Content preview:")
-                    print("-" * 50)
-                    print(result.markdown[:500])
-                    print("-" * 50)
-                    
-                    results.append({
-                        **url_data,  # Include all metadata from structured_urls
-                        "content": result.markdown,
-                        "status": "success"
-                    })
-                else:
-                    print(f"Failed to crawl {url_data['url']}: {result.error_message if result.error_message else 'No content extracted'}")
-                    results.append({
-                        **url_data,
-                        "content": None,
-                        "status": "failed",
-                        "error": result.error_message if result.error_message else "No content extracted"
-                    })
-            except Exception as e:
-                print(f"Error crawling {url_data['url']}: {str(e)}")
-                results.append({
-                    **url_data,
-                    "content": None,
-                    "status": "error",
-                    "error": str(e)
-                })
+    new_results = {}
+    if pending_urls:
+        try:
+            async with AsyncWebCrawler(config=browser_config) as crawler:
+                for result in await asyncio.gather(*(crawl_and_record(url_data) for url_data in pending_urls)):
+                    new_results[result['url']] = result
+        finally:
+            if journal:
+                journal.close()
                 
-    return results 
+    # Return results in sitemap order, taking pages finished by an earlier run from the journal
+    return [
+        completed.get(url_data['url']) or new_results[url_data['url']]
+        for url_data in structured_urls
+    ]
 
-async def start_scraping_website(url: str) -> bool:
+async def start_scraping_website(
+    url: str,
+    resume: bool = True,
+    include_paths: Optional[List[str]] = None,
+    exclude_paths: Optional[List[str]] = None
+) -> bool:
     """
     Start scraping a website and populate the RAG engine with the content.
     
+    Progress is journaled to disk, so calling this again after a crash picks
+    up where the previous run stopped. The journal is removed only once a
+    complete crawl has been ingested; if the sitemap yields no URLs the job
+    fails and the journal and the current index are kept.
+    
+    Several jobs can run concurrently on one event loop. They share its HTTP
+    session, which the owner of the loop closes with scraper.http.close_session.
+    
     Args:
         url: The URL of the website to scrape (should be a sitemap URL)
+        resume: Reuse pages from an existing journal instead of starting over
+        include_paths: Paths to crawl (see extract_urls_from_sitemap)
+        exclude_paths: Paths to skip (see extract_urls_from_sitemap)
         
     Returns:
         bool: True if scraping and population was successful, False otherwise
@@ -178,9 +425,18 @@ async def start_scraping_website(url: str) -> bool:
         # Initialize RAG engine
         rag_engine = RAGEngine()
         
+        journal = CrawlJournal.for_sitemap(url)
+        if not resume:
+            journal.remove()
+        
         # Scrape content
         print(f"Starting to scrape website: {url}")
-        scraped_results = await crawl_sitemap(url)
+        scraped_results = await crawl_sitemap(
+            url,
+            journal=journal,
+            include_paths=include_paths,
+            exclude_paths=exclude_paths
+        )
         
         if not scraped_results:
             print("No content was scraped from the website")
@@ -189,6 +445,7 @@ async def start_scraping_website(url: str) -> bool:
         # Populate database with scraped content
         print("Populating RAG engine with scraped content...")
         rag_engine.populate_from_scraped_results(scraped_results, clear_db=True)
+        journal.remove()
         
         print(f"Successfully populated database with {rag_engine.vector_store.count_documents()} documents")
         return True
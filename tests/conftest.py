@@ -0,0 +1,11 @@
+"""
+Shared test setup.
+
+Makes the repository root importable and provides a dummy API key, since
+rag.config refuses to load without one. No test talks to the Gemini API.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
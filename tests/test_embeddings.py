@@ -0,0 +1,92 @@
+"""
+Tests for the hashing TF-IDF embedder.
+"""
+import numpy as np
+import pytest
+from rag.embeddings import HashingEmbedder, similarity_from_distance, tokenize
+
+CORPUS = [
+    "Install pydantic-ai with pip and run the first example.",
+    "The Agent class accepts tools, a model and a system prompt.",
+    "Streaming responses need an async context manager.",
+    "Validation errors are raised when a model field has the wrong type."
+]
+
+
+def test_tokenize_lowercases_and_drops_punctuation():
+    assert tokenize("Install Pydantic-AI, then run_it!") == ["install", "pydantic", "ai", "then", "run_it"]
+
+
+def test_document_vectors_are_deterministic_unit_vectors():
+    embedder = HashingEmbedder(dimension=256)
+    first = embedder.embed_documents(CORPUS, update_stats=False)
+    second = HashingEmbedder(dimension=256).embed_documents(CORPUS, update_stats=False)
+
+    assert first.shape == (len(CORPUS), 256)
+    assert first.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(first, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_empty_text_embeds_to_zero():
+    vectors = HashingEmbedder(dimension=64).embed_documents(["", "!!!"], update_stats=False)
+    assert not vectors.any()
+
+
+def test_batch_embedding_matches_one_by_one():
+    embedder = HashingEmbedder(dimension=128)
+    batch = embedder.embed_documents(CORPUS, update_stats=False)
+    single = np.vstack([embedder.embed_documents([text], update_stats=False) for text in CORPUS])
+    np.testing.assert_allclose(batch, single, rtol=1e-6)
+
+
+def test_query_ranks_the_matching_document_first():
+    embedder = HashingEmbedder()
+    documents = embedder.embed_documents(CORPUS)
+    for expected, query in enumerate([
+        "how do I install it with pip",
+        "what does the Agent class accept",
+        "async streaming responses",
+        "validation error for a wrong field type"
+    ]):
+        scores = documents @ embedder.embed_queries([query])[0]
+        assert int(np.argmax(scores)) == expected, query
+
+
+def test_document_frequencies_are_counted_and_persisted(tmp_path):
+    stats_path = str(tmp_path / "stats.npz")
+    embedder = HashingEmbedder(dimension=128, stats_path=stats_path)
+    embedder.embed_documents(CORPUS)
+
+    reloaded = HashingEmbedder(dimension=128, stats_path=stats_path)
+    assert reloaded.num_docs == len(CORPUS)
+    np.testing.assert_array_equal(reloaded.doc_freq, embedder.doc_freq)
+
+    reloaded.reset_stats()
+    assert HashingEmbedder(dimension=128, stats_path=stats_path).num_docs == 0
+
+
+def test_stats_of_another_dimension_are_rejected(tmp_path):
+    stats_path = str(tmp_path / "stats.npz")
+    HashingEmbedder(dimension=128, stats_path=stats_path).embed_documents(CORPUS)
+
+    with pytest.raises(ValueError):
+        HashingEmbedder(dimension=64, stats_path=stats_path)
+
+
+def test_query_terms_unseen_in_the_corpus_do_not_lower_scores():
+    # Wide enough that the padding n-grams don't share a bucket with the corpus
+    embedder = HashingEmbedder(dimension=4096)
+    documents = embedder.embed_documents(CORPUS)
+    plain = documents[0] @ embedder.embed_queries(["install pip"])[0]
+    padded = documents[0] @ embedder.embed_queries(["install pip zyzzyva quuxbar"])[0]
+    assert padded == pytest.approx(plain, rel=1e-5)
+
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_similarity_from_distance_recovers_cosine(space):
+    a = np.array([0.6, 0.8])
+    b = np.array([1.0, 0.0])
+    cosine = float(a @ b)
+    distance = {"l2": float(((a - b) ** 2).sum()), "cosine": 1.0 - cosine, "ip": 1.0 - cosine}[space]
+    assert similarity_from_distance(distance, space) == pytest.approx(cosine)
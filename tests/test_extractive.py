@@ -0,0 +1,66 @@
+"""
+Tests for extractive answers.
+"""
+from rag.extractive import content_terms, extract_answer, split_sentences
+
+CHUNK = (
+    "# Installation\n\n"
+    "Pydantic AI is a Python agent framework. "
+    "Install it with pip install pydantic-ai. "
+    "It needs Python 3.9 or newer!\n"
+    "- Streaming works with any async model.\n"
+    "- Retries are configured per agent."
+)
+
+
+def test_split_sentences_breaks_on_punctuation_and_markdown_structure():
+    assert split_sentences(CHUNK) == [
+        "# Installation",
+        "Pydantic AI is a Python agent framework.",
+        "Install it with pip install pydantic-ai.",
+        "It needs Python 3.9 or newer!",
+        "- Streaming works with any async model.",
+        "- Retries are configured per agent."
+    ]
+
+
+def test_split_sentences_handles_collapsed_whitespace():
+    collapsed = " ".join(CHUNK.split())
+    assert split_sentences(collapsed)[:2] == [
+        "# Installation Pydantic AI is a Python agent framework.",
+        "Install it with pip install pydantic-ai."
+    ]
+    assert split_sentences("Intro text. ## Usage Call run() first.") == [
+        "Intro text.",
+        "## Usage Call run() first."
+    ]
+
+
+def test_split_sentences_skips_fragments_without_words():
+    assert split_sentences("First.\n\n---\n\nSecond.") == ["First.", "Second."]
+
+
+def test_content_terms_drop_stop_words():
+    assert content_terms("How do I install it with pip?") == {"install", "pip"}
+
+
+def test_extract_answer_picks_the_sentence_covering_the_query():
+    span, coverage = extract_answer("How do I install pydantic-ai with pip?", CHUNK, max_sentences=2)
+    assert span == "Install it with pip install pydantic-ai."
+    assert coverage == 1.0
+
+
+def test_extract_answer_joins_sentences_when_one_is_not_enough():
+    span, coverage = extract_answer("framework install pip", CHUNK, max_sentences=2)
+    assert span == "Pydantic AI is a Python agent framework. Install it with pip install pydantic-ai."
+    assert coverage == 1.0
+
+    span, coverage = extract_answer("framework install pip", CHUNK, max_sentences=1)
+    assert span == "Install it with pip install pydantic-ai."
+    assert coverage == 2 / 3
+
+
+def test_extract_answer_returns_none_without_overlap():
+    assert extract_answer("caching embeddings", CHUNK) is None
+    assert extract_answer("what is it?", CHUNK) is None
+    assert extract_answer("install", "") is None
@@ -0,0 +1,93 @@
+"""
+Tests for metadata filters: path prefix fields, where clause pushdown and the
+intent classifier.
+"""
+import pytest
+from rag import config
+from rag.filters import (
+    build_where,
+    classify_query_intent,
+    matches,
+    needs_post_filter,
+    path_prefix_metadata
+)
+
+
+def test_path_prefix_metadata_stops_at_the_configured_depth(monkeypatch):
+    monkeypatch.setattr(config, "PATH_PREFIX_DEPTH", 3)
+
+    assert path_prefix_metadata("/api/models/gemini/streaming/") == {
+        "path_prefix_1": "/api/",
+        "path_prefix_2": "/api/models/",
+        "path_prefix_3": "/api/models/gemini/"
+    }
+    assert path_prefix_metadata("/") == {}
+
+
+def test_build_where():
+    assert build_where(None) is None
+    assert build_where({"type": None}) is None
+    assert build_where({"type": "api"}) == {"type": {"$eq": "api"}}
+    assert build_where({"type": ["api", "guide"]}) == {"type": {"$in": ["api", "guide"]}}
+    assert build_where({"type": "api", "path_prefix": "api/models"}) == {
+        "$and": [
+            {"type": {"$eq": "api"}},
+            {"path_prefix_2": {"$eq": "/api/models/"}}
+        ]
+    }
+
+
+def test_prefix_deeper_than_the_stored_fields_needs_a_post_filter(monkeypatch):
+    monkeypatch.setattr(config, "PATH_PREFIX_DEPTH", 2)
+    filters = {"path_prefix": "/api/models/gemini/"}
+
+    assert build_where(filters) == {"path_prefix_2": {"$eq": "/api/models/"}}
+    assert needs_post_filter(filters)
+    assert not needs_post_filter({"path_prefix": "/api/models/"})
+    assert not needs_post_filter({"type": "api"})
+
+
+def test_matches_checks_prefixes_on_whole_segments():
+    metadata = {"type": "api", "path": "/api/models/gemini/"}
+
+    assert matches(metadata, {"path_prefix": "/api/models"})
+    assert not matches(metadata, {"path_prefix": "/api/mod"})
+    assert matches(metadata, {"type": ["api", "guide"], "path_prefix": "/api/"})
+    assert not matches(metadata, {"type": "guide"})
+    assert not matches({"path": "/api/"}, {"type": "api"})
+
+
+def test_classify_query_intent(monkeypatch):
+    monkeypatch.setattr(config, "INTENT_MIN_SCORE", 1)
+    monkeypatch.setattr(config, "INTENT_MIN_MARGIN", 1)
+
+    assert classify_query_intent("Which parameters does the Agent class accept?") == {"type": "api"}
+    assert classify_query_intent("Show me an example") == {"type": "examples"}
+    assert classify_query_intent("Tell me about Pydantic") is None
+
+
+def test_where_clause_is_applied_by_chroma():
+    chromadb = pytest.importorskip("chromadb")
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection("filter_pushdown_test")
+    pages = [("/api/models/", "api"), ("/api/agents/", "api"), ("/guide/install/", "guide")]
+    collection.add(
+        ids=[str(i) for i in range(len(pages))],
+        embeddings=[[1.0, float(i)] for i in range(len(pages))],
+        documents=[path for path, _ in pages],
+        metadatas=[{"type": content_type, "path": path, **path_prefix_metadata(path)} for path, content_type in pages]
+    )
+
+    results = collection.query(
+        query_embeddings=[[1.0, 0.0]],
+        n_results=3,
+        where=build_where({"path_prefix": "/api/"})
+    )
+    assert sorted(results["documents"][0]) == ["/api/agents/", "/api/models/"]
+
+    results = collection.query(
+        query_embeddings=[[1.0, 0.0]],
+        n_results=3,
+        where=build_where({"type": "guide"})
+    )
+    assert results["documents"][0] == ["/guide/install/"]
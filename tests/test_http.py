@@ -0,0 +1,32 @@
+"""
+Tests for the shared HTTP session.
+"""
+import asyncio
+import gc
+from scraper import http
+
+
+def test_session_is_shared_per_loop_and_closed_with_it():
+    async def use_session():
+        session = http.get_session()
+        assert http.get_session() is session
+        return session
+
+    first = asyncio.run(use_session())
+    second = asyncio.run(use_session())
+    gc.collect()
+
+    assert first is not second
+    assert first.closed and second.closed
+    assert len(http._sessions) == 0
+
+
+def test_close_session_closes_and_forgets_the_session():
+    async def use_and_close():
+        session = http.get_session()
+        await http.close_session()
+        return session, http.get_session()
+
+    closed, fresh = asyncio.run(use_and_close())
+    assert closed.closed
+    assert fresh is not closed and fresh.closed
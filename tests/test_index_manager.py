@@ -0,0 +1,90 @@
+"""
+Tests for blue/green index builds, using a throwaway Chroma store.
+"""
+import time
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+
+from rag import config, sharding
+from rag.index_manager import IndexManager
+from rag.page_store import PageStore
+from rag.vector_store import VectorStore
+
+PAGES = [
+    {
+        "url": f"https://example.com/guide/{i}",
+        "type": "guide",
+        "path": f"/guide/page{i}/",
+        "source": "sitemap",
+        "images": [],
+        "status": "success",
+        "content": f"Install with pip install pydantic-ai then run example {i}. Streaming needs an async context."
+    }
+    for i in range(3)
+]
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHROMA_PERSIST_DIRECTORY", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(config, "EMBEDDER_STATS_DIRECTORY", str(tmp_path / "chroma_db" / "embedder_stats"))
+    monkeypatch.setattr(config, "NUM_SHARDS", 0)
+    monkeypatch.setattr(config, "SHARD_SEARCH_WORKERS", 1)
+    page_store = PageStore()
+    page_store.replace(PAGES)
+    yield IndexManager(page_store=page_store)
+    sharding.discard_search_pool(config.CHROMA_PERSIST_DIRECTORY)
+
+
+def test_build_is_activated_and_served(manager):
+    name = manager.build()
+
+    assert manager.registry.active_name() == name
+    assert not manager.needs_reindex()
+    store = VectorStore()
+    assert store.collection_name == name
+    assert store.count_documents() == len(PAGES)
+
+
+@pytest.mark.parametrize("setting, value", [("EMBEDDING_DIMENSION", 256), ("NUM_SHARDS", 2)])
+def test_active_build_keeps_serving_after_settings_change(manager, monkeypatch, setting, value):
+    old = manager.build()
+    monkeypatch.setattr(config, setting, value)
+    assert manager.needs_reindex()
+
+    # Until the rebuild is swapped in, queries are served from the old build with its own settings
+    store = VectorStore()
+    assert store.collection_name == old
+    assert store.similarity_search("install pydantic-ai with pip", k=1)
+
+    new = manager.build()
+    manager.garbage_collect(grace_seconds=0)
+    assert set(manager.registry.builds()) == {new}
+    assert VectorStore().similarity_search("install pydantic-ai with pip", k=1)
+
+
+def test_failed_builds_are_collected(manager, monkeypatch):
+    active = manager.build()
+
+    def fail(*args):
+        raise ValueError("verification failed")
+
+    monkeypatch.setattr(IndexManager, "_verify", staticmethod(fail))
+    with pytest.raises(ValueError):
+        manager.build()
+    assert manager.registry.active_name() == active
+    assert all(build["status"] != "failed" for build in manager.registry.builds().values())
+
+
+def test_periodic_gc_collects_retired_builds(manager, monkeypatch):
+    old = manager.build()
+    new = manager.build()
+    monkeypatch.setattr(config, "INDEX_GC_GRACE_SECONDS", 0)
+
+    manager.start_periodic_gc(interval=0.05)
+    deadline = time.monotonic() + 10
+    while old in manager.registry.builds() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert set(manager.registry.builds()) == {new}
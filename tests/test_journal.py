@@ -0,0 +1,125 @@
+"""
+Tests for the crawl journal and resuming interrupted crawls.
+"""
+import asyncio
+import json
+import pytest
+from scraper.journal import CrawlJournal
+
+
+def page(url, status="success"):
+    return {"url": url, "type": "api", "path": "/api/", "source": "sitemap", "images": [],
+            "content": f"Content of {url}" if status == "success" else None, "status": status}
+
+
+def test_completed_holds_only_successful_pages(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    journal.append(page("https://example.com/a"))
+    journal.append(page("https://example.com/b", status="error"))
+    journal.close()
+
+    assert set(CrawlJournal(journal.path).completed()) == {"https://example.com/a"}
+
+
+def test_later_entries_win(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    journal.append(page("https://example.com/a", status="error"))
+    journal.append(page("https://example.com/a"))
+    journal.close()
+
+    assert journal.load()["https://example.com/a"]["status"] == "success"
+
+
+def test_torn_last_line_is_skipped_and_appending_continues_cleanly(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(json.dumps(page("https://example.com/a")) + "\n" + '{"url": "https://example.com/b", "sta')
+
+    journal = CrawlJournal(str(path))
+    assert set(journal.completed()) == {"https://example.com/a"}
+
+    # A crawl resumed after the crash appends behind the torn line
+    journal.append(page("https://example.com/b"))
+    journal.close()
+    assert set(CrawlJournal(str(path)).completed()) == {"https://example.com/a", "https://example.com/b"}
+
+
+def test_for_sitemap_is_stable_per_url(tmp_path, monkeypatch):
+    from scraper import config
+    monkeypatch.setattr(config, "CRAWL_JOURNAL_DIRECTORY", str(tmp_path))
+
+    first = CrawlJournal.for_sitemap("https://example.com/sitemap.xml")
+    assert first.path == CrawlJournal.for_sitemap("https://example.com/sitemap.xml").path
+    assert first.path != CrawlJournal.for_sitemap("https://example.com/other.xml").path
+
+
+def test_remove_deletes_the_file(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    journal.append(page("https://example.com/a"))
+    journal.remove()
+
+    assert journal.load() == {}
+    journal.remove()  # Removing twice is fine
+
+
+def test_crawl_sitemap_resumes_from_the_journal(tmp_path, monkeypatch):
+    pytest.importorskip("crawl4ai")
+    import scraper_methods
+
+    urls = [page(f"https://example.com/{name}") for name in ("a", "b", "c")]
+    for url_data in urls:
+        del url_data["content"], url_data["status"]
+
+    async def fake_extract(*args, **kwargs):
+        return [dict(url_data) for url_data in urls]
+
+    crawled = []
+
+    async def fake_crawl(crawler, url_data, run_config, rate_limiters):
+        crawled.append(url_data["url"])
+        return {**url_data, "content": f"Fresh {url_data['url']}", "status": "success"}
+
+    class FakeCrawler:
+        def __init__(self, config=None):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(scraper_methods, "extract_urls_from_sitemap", fake_extract)
+    monkeypatch.setattr(scraper_methods, "_crawl_url", fake_crawl)
+    monkeypatch.setattr(scraper_methods, "AsyncWebCrawler", FakeCrawler)
+
+    # An earlier run finished "a" and failed on "b" before it died
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    journal.append(page("https://example.com/a"))
+    journal.append(page("https://example.com/b", status="error"))
+    journal.close()
+
+    results = asyncio.run(scraper_methods.crawl_sitemap("https://example.com/sitemap.xml", journal=journal))
+
+    assert crawled == ["https://example.com/b", "https://example.com/c"]
+    assert [result["url"] for result in results] == [url_data["url"] for url_data in urls]
+    assert results[0]["content"] == "Content of https://example.com/a"
+    assert set(journal.completed()) == {url_data["url"] for url_data in urls}
+
+
+def test_crawl_sitemap_keeps_the_journal_when_the_sitemap_is_unreachable(tmp_path, monkeypatch):
+    pytest.importorskip("crawl4ai")
+    import scraper_methods
+
+    async def fake_extract(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(scraper_methods, "extract_urls_from_sitemap", fake_extract)
+
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    journal.append(page("https://example.com/a"))
+    journal.close()
+
+    results = asyncio.run(scraper_methods.crawl_sitemap("https://example.com/sitemap.xml", journal=journal))
+
+    assert results == []
+    assert set(journal.completed()) == {"https://example.com/a"}
@@ -0,0 +1,95 @@
+"""
+Tests for LLMClient, driven by FakeGenerativeModel.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+import pytest
+from rag.fake_llm import FakeGenerativeModel
+from rag.llm_client import LLMClient, LLMRateLimitError, LLMTimeoutError
+
+
+def make_client(model, **kwargs):
+    options = {"max_concurrency": 4, "max_retries": 3, "timeout": 5.0, "base_backoff": 0.01, "max_backoff": 0.05}
+    options.update(kwargs)
+    return LLMClient(model, **options)
+
+
+def test_identical_concurrent_prompts_share_one_request():
+    model = FakeGenerativeModel(latency=0.3)
+    client = make_client(model)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(lambda _: client.generate("same prompt"), range(8)))
+
+    assert model.calls == 1
+    assert len(set(answers)) == 1
+
+
+def test_different_prompts_are_not_coalesced():
+    model = FakeGenerativeModel(latency=0.1)
+    client = make_client(model)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(client.generate, ["a", "b", "c"]))
+
+    assert model.calls == 3
+
+
+def test_rate_limit_is_retried_until_it_succeeds():
+    model = FakeGenerativeModel(fail_first=2, failure_code=429)
+    client = make_client(model)
+
+    assert client.generate("prompt").startswith("Fake answer")
+    assert model.calls == 3
+
+
+def test_rate_limit_error_when_retries_run_out():
+    model = FakeGenerativeModel(fail_first=10, failure_code=429)
+    client = make_client(model, max_retries=2)
+
+    with pytest.raises(LLMRateLimitError):
+        client.generate("prompt")
+    assert model.calls == 3
+
+
+def test_non_retryable_error_is_raised_immediately():
+    model = FakeGenerativeModel(fail_first=1, failure_code=400)
+    client = make_client(model)
+
+    with pytest.raises(Exception) as error:
+        client.generate("prompt")
+    assert getattr(error.value, "code", None) == 400
+    assert model.calls == 1
+
+
+@pytest.mark.parametrize("max_retries", [0, 3])
+def test_deadline_raises_timeout(max_retries):
+    model = FakeGenerativeModel(latency=2.0)
+    client = make_client(model, max_retries=max_retries)
+
+    with pytest.raises(LLMTimeoutError):
+        client.generate("prompt", timeout=0.2)
+
+
+def test_waiting_for_a_slot_counts_against_the_deadline():
+    model = FakeGenerativeModel(latency=0.5)
+    client = make_client(model, max_concurrency=1)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(client.generate, "first")
+        time.sleep(0.05)  # Let the first call take the only slot
+        second = pool.submit(client.generate, "second", timeout=0.2)
+        with pytest.raises(LLMTimeoutError):
+            second.result()
+        assert first.result().startswith("Fake answer")
+
+
+def test_concurrency_cap_limits_requests_in_flight():
+    model = FakeGenerativeModel(latency=0.1)
+    client = make_client(model, max_concurrency=2)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: client.generate(f"prompt {i}"), range(8)))
+
+    assert model.calls == 8
+    assert model.max_in_flight == 2
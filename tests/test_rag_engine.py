@@ -0,0 +1,101 @@
+"""
+Tests for RAGEngine query modes, using a throwaway Chroma store and FakeGenerativeModel.
+"""
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+
+from rag import config
+from rag.fake_llm import FakeGenerativeModel
+from rag.llm_client import LLMClient
+from rag.rag_engine import QueryStats, RAGEngine, query_stats
+
+PAGES = [
+    {
+        "url": f"https://example.com/{content_type}/{i}",
+        "type": content_type,
+        "path": f"/{content_type}/page{i}/",
+        "source": "sitemap",
+        "images": [],
+        "status": "success",
+        "content": f"# Page {i}\n\n{text}"
+    }
+    for i in range(3)
+    for content_type, text in [
+        ("guide", "Install with pip install pydantic-ai then run the example. Streaming needs an async context."),
+        ("api", "The Agent class accepts tools and a model parameter. Results are validated with Pydantic models.")
+    ]
+]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHROMA_PERSIST_DIRECTORY", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(config, "EMBEDDER_STATS_DIRECTORY", str(tmp_path / "chroma_db" / "embedder_stats"))
+    monkeypatch.setattr(config, "QUERY_SNAPSHOT_PATH", None)
+    monkeypatch.setattr(config, "NUM_SHARDS", 0)
+    monkeypatch.setattr(config, "EXTRACTIVE_MIN_SCORE", 0.3)
+    monkeypatch.setattr(config, "EXTRACTIVE_MIN_COVERAGE", 0.75)
+    model = FakeGenerativeModel()
+    rag_engine = RAGEngine(llm_client=LLMClient(model))
+    rag_engine.populate_from_scraped_results(PAGES, clear_db=True)
+    rag_engine.fake_model = model
+    return rag_engine
+
+
+def test_retrieve_returns_ranked_chunks_with_urls_and_scores(engine):
+    results = engine.retrieve("How do I install pydantic-ai with pip?", k=3)
+
+    assert [result["rank"] for result in results] == [1, 2, 3]
+    assert all(result["url"].startswith("https://example.com/guide/") for result in results)
+    scores = [result["score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+    assert 0.0 < scores[0] <= 1.0
+    assert engine.fake_model.calls == 0
+
+
+def test_retrieve_mode_skips_generation(engine):
+    before = query_stats.summary()
+    answer = engine.query("How do I install pydantic-ai with pip?", mode="retrieve")
+
+    assert answer.startswith("1. https://example.com/guide/")
+    assert engine.fake_model.calls == 0
+    assert query_stats.summary()["skipped"] == before["skipped"] + 1
+
+
+def test_extractive_mode_answers_confident_queries_without_the_llm(engine):
+    answer = engine.query("How do I install pydantic-ai with pip?", mode="extractive")
+
+    assert "Install with pip install pydantic-ai then run the example." in answer
+    assert "Streaming" not in answer
+    assert "Source: https://example.com/guide/" in answer
+    assert engine.fake_model.calls == 0
+
+
+def test_extractive_mode_falls_back_to_generation(engine):
+    before = query_stats.summary()
+    answer = engine.query("How does caching of embeddings work?", mode="extractive")
+
+    assert answer.startswith("Fake answer")
+    assert engine.fake_model.calls == 1
+    after = query_stats.summary()
+    assert after["generated"] == before["generated"] + 1
+    assert after["skipped"] == before["skipped"]
+
+
+def test_unknown_mode_is_rejected(engine):
+    with pytest.raises(ValueError):
+        engine.query("anything", mode="summarize")
+
+
+def test_queries_without_results_are_not_counted_as_skips():
+    stats = QueryStats()
+    for outcome in ["generated", "retrieve", "extractive", "no_results", "no_results"]:
+        stats.record(outcome)
+
+    summary = stats.summary()
+    assert summary["queries"] == 5
+    assert summary["skipped"] == 2
+    assert summary["no_results"] == 2
+    assert summary["skip_rate"] == pytest.approx(2 / 3)
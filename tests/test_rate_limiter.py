@@ -0,0 +1,132 @@
+"""
+Tests for the per-host rate limiter: Retry-After and crawl-delay parsing, and
+the token bucket / AIMD window.
+"""
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from scraper import config
+from scraper.rate_limiter import (
+    HostRateLimiter,
+    get_rate_limiters,
+    parse_crawl_delay,
+    parse_retry_after,
+    retry_after_from_headers
+)
+
+
+def test_parse_retry_after_seconds_and_dates():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 55 <= parse_retry_after(in_a_minute) <= 60
+
+
+def test_retry_after_header_lookup_is_case_insensitive():
+    assert retry_after_from_headers({"retry-after": "3"}) == 3.0
+    assert retry_after_from_headers({"Content-Type": "text/html"}) is None
+    assert retry_after_from_headers(None) is None
+
+
+def test_parse_crawl_delay_accepts_fractional_values():
+    assert parse_crawl_delay("User-agent: *\nCrawl-delay: 0.5\n", "*") == 0.5
+
+
+def test_parse_crawl_delay_prefers_the_group_naming_our_agent():
+    robots = (
+        "User-agent: *\n"
+        "Disallow: /private\n"
+        "Crawl-delay: 1.5\n"
+        "\n"
+        "User-agent: mybot\n"
+        "Crawl-delay: 2  # be gentle\n"
+    )
+    assert parse_crawl_delay(robots, "mybot/1.0") == 2.0
+    assert parse_crawl_delay(robots, "otherbot") == 1.5
+
+
+def test_parse_crawl_delay_ignores_other_agents_and_invalid_values():
+    assert parse_crawl_delay("User-agent: googlebot\nCrawl-delay: 3\n", "*") is None
+    assert parse_crawl_delay("User-agent: *\nCrawl-delay: slow\n", "*") is None
+    assert parse_crawl_delay("", "*") is None
+
+
+def test_crawl_delay_caps_the_rate():
+    limiter = HostRateLimiter("example.com", rate=4.0, burst=4)
+    limiter.set_crawl_delay(0.5)
+
+    assert limiter.max_rate == 2.0
+    assert limiter.burst == 1
+
+
+def test_throttle_halves_the_window_and_blocks_for_retry_after():
+    async def scenario():
+        limiter = HostRateLimiter("example.com", initial_concurrency=4, max_concurrency=8)
+        started = await limiter.acquire()
+        await limiter.release(started, status=429, retry_after=0.3)
+        assert limiter.concurrency == 2
+
+        before = time.monotonic()
+        started = await limiter.acquire()
+        waited = time.monotonic() - before
+        await limiter.release(started, status=200)
+        return waited
+
+    assert asyncio.run(scenario()) >= 0.25
+
+
+def test_successes_grow_the_window_up_to_the_maximum():
+    async def scenario():
+        limiter = HostRateLimiter("example.com", rate=1000.0, burst=1000, initial_concurrency=1, max_concurrency=3)
+        for _ in range(50):
+            async with limiter.slot() as outcome:
+                await asyncio.sleep(0.01)  # Steady latency, so the window only sees successes
+                outcome["status"] = 200
+        return limiter.concurrency
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_window_limits_requests_in_flight():
+    async def scenario():
+        limiter = HostRateLimiter("example.com", rate=1000.0, burst=1000, initial_concurrency=2, max_concurrency=2)
+        in_flight = 0
+        peak = 0
+
+        async def request():
+            nonlocal in_flight, peak
+            async with limiter.slot() as outcome:
+                in_flight += 1
+                peak = max(peak, in_flight)
+                await asyncio.sleep(0.02)
+                in_flight -= 1
+                outcome["status"] = 200
+
+        await asyncio.gather(*(request() for _ in range(10)))
+        return peak
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_each_event_loop_gets_its_own_registry(monkeypatch):
+    monkeypatch.setattr(config, "RESPECT_ROBOTS_TXT", False)
+
+    async def crawl_job():
+        registry = get_rate_limiters()
+        assert get_rate_limiters() is registry
+        limiter = await registry.for_url("https://example.com/page")
+        limiter.set_crawl_delay(0.05)
+        # The second request has to wait for a token, which uses loop-bound primitives
+        for _ in range(2):
+            async with limiter.slot() as outcome:
+                outcome["status"] = 200
+        return registry
+
+    # Two jobs in one process, like two scraping runs in the same worker
+    first = asyncio.run(crawl_job())
+    second = asyncio.run(crawl_job())
+    assert first is not second
@@ -0,0 +1,68 @@
+"""
+Tests for the sharded search pool.
+"""
+import os
+import signal
+import pytest
+
+pytest.importorskip("chromadb")
+
+from rag import sharding
+
+
+@pytest.fixture
+def persist_directory(tmp_path):
+    directory = str(tmp_path / "chroma_db")
+    yield directory
+    sharding.discard_search_pool(directory)
+
+
+def test_shard_assignment_is_stable():
+    assert sharding.shard_for_id("chunk-1", 4) == sharding.shard_for_id("chunk-1", 4)
+    assert {sharding.shard_for_id(f"chunk-{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_generation_marker_changes_on_bump(tmp_path):
+    directory = str(tmp_path)
+    assert sharding.read_generation(directory) == ""
+    sharding.bump_generation(directory)
+    first = sharding.read_generation(directory)
+    sharding.bump_generation(directory)
+    assert first and sharding.read_generation(directory) != first
+
+
+def test_broken_pool_is_replaced(persist_directory):
+    pool = sharding.get_search_pool(persist_directory, 1)
+    assert sharding.get_search_pool(persist_directory, 1) is pool
+
+    worker_pid = pool.worker_for_shard(0).submit(sharding._ping).result()
+    os.kill(worker_pid, signal.SIGKILL)
+
+    # The search that hits the dead worker is retried on a fresh pool
+    assert sharding.search_shards(persist_directory, 1, ["docs_shard_0"], [0.0, 1.0], 3) == []
+    assert pool.broken
+    fresh = sharding.get_search_pool(persist_directory, 1)
+    assert fresh is not pool
+    assert fresh.search(["docs_shard_0"], [0.0, 1.0], 3) == []
+
+
+def test_shards_are_pinned_to_workers(persist_directory):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    names = [sharding.shard_collection_name("docs", shard) for shard in range(4)]
+    for shard, name in enumerate(names):
+        client.create_collection(name).add(
+            ids=[f"chunk-{shard}"],
+            embeddings=[[1.0, float(shard)]],
+            documents=[f"Shard {shard}"],
+            metadatas=[{"shard": shard}]
+        )
+
+    pool = sharding.get_search_pool(persist_directory, 2)
+    hits = pool.search(names, [1.0, 0.0], 4)
+    assert sorted(hit[1] for hit in hits) == [f"Shard {shard}" for shard in range(4)]
+
+    # Each worker only opened the shards pinned to it
+    assert pool.worker_for_shard(0).submit(sharding._loaded_collections).result() == [names[0], names[2]]
+    assert pool.worker_for_shard(1).submit(sharding._loaded_collections).result() == [names[1], names[3]]
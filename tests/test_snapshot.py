@@ -0,0 +1,157 @@
+"""
+Tests for memory-mapped snapshots, using a throwaway Chroma store.
+"""
+import json
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain")
+
+from rag import config
+from rag.document_processor import DocumentProcessor
+from rag.page_store import scraped_result_to_document
+from rag.snapshot import SnapshotIndex
+from rag.vector_store import VectorStore
+
+TOPICS = {
+    "guide": "Install pydantic-ai with pip and configure the model provider",
+    "api": "The Agent class accepts tools, a system prompt and a result type",
+    "examples": "An example weather agent streams its responses to the terminal"
+}
+
+# A distinct word per page, so no two pages tie for a query
+WORDS = [
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel",
+    "india", "juliet", "kilo", "lima", "mike", "november", "oscar", "papa",
+    "quebec", "romeo", "sierra", "tango", "uniform", "victor", "whiskey", "xray"
+]
+
+PAGES = [
+    {
+        "url": f"https://example.com/{content_type}/{section}/{i}",
+        "type": content_type,
+        "path": f"/{content_type}/{section}/page{i}/",
+        "source": "sitemap",
+        "images": [],
+        "status": "success",
+        "content": f"{text} in section {section}. Codename {WORDS[n]}."
+    }
+    for n, (content_type, section, i, text) in enumerate(
+        (content_type, section, i, text)
+        for content_type, text in TOPICS.items()
+        for section in ("basics", "advanced")
+        for i in range(4)
+    )
+]
+
+QUERIES = ["install with pip codename alpha", "agent class tools kilo", "weather streaming xray", "codename romeo"]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHROMA_PERSIST_DIRECTORY", str(tmp_path / "chroma_db"))
+    monkeypatch.setattr(config, "EMBEDDER_STATS_DIRECTORY", str(tmp_path / "chroma_db" / "embedder_stats"))
+    monkeypatch.setattr(config, "NUM_SHARDS", 0)
+    vector_store = VectorStore()
+    chunks = DocumentProcessor().process_documents([scraped_result_to_document(page) for page in PAGES])
+    vector_store.add_documents(chunks)
+    return vector_store
+
+
+@pytest.fixture
+def snapshot(store, tmp_path):
+    path = str(tmp_path / "snapshot")
+    store.export_snapshot(path)
+    return SnapshotIndex(path)
+
+
+def urls(results):
+    return [doc.metadata["url"] for doc, _ in results]
+
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_round_trip_ranks_like_chroma(store, tmp_path, quantization):
+    path = str(tmp_path / f"snapshot_{quantization}")
+    manifest = store.export_snapshot(path, quantization)
+    snapshot = SnapshotIndex(path)
+
+    assert manifest["count"] == snapshot.count_documents() == store.count_documents() == len(PAGES)
+    for query in QUERIES:
+        expected = store.similarity_search_with_scores(query, k=5)
+        results = snapshot.similarity_search_with_scores(query, k=5)
+        # The codename makes the top hit unique; the pages behind it tie, so compare their scores
+        assert urls(results)[0] == urls(expected)[0], query
+        np.testing.assert_allclose(
+            [score for _, score in results],
+            [score for _, score in expected],
+            atol=0.02
+        )
+
+
+def test_metadata_and_texts_survive_the_round_trip(store, snapshot):
+    records = store.collection.get(include=["documents", "metadatas"])
+    by_id = {chunk_id: (text, metadata) for chunk_id, text, metadata in zip(
+        records["ids"], records["documents"], records["metadatas"]
+    )}
+    for row in range(snapshot.count_documents()):
+        assert (snapshot.texts[row], snapshot.get_metadata(row)) == by_id[snapshot.ids[row]]
+
+
+def test_manifest_holds_embedder_settings_but_no_metadata_values(snapshot):
+    with open(os.path.join(snapshot.path, "manifest.json"), encoding="utf-8") as f:
+        manifest_text = f.read()
+    assert "https://example.com" not in manifest_text
+    assert json.loads(manifest_text)["embedder"] == {
+        "name": config.EMBEDDER,
+        "dimension": config.EMBEDDING_DIMENSION,
+        "ngram_range": list(config.EMBEDDING_NGRAM_RANGE)
+    }
+
+
+def test_import_restores_a_writable_store(snapshot, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CHROMA_PERSIST_DIRECTORY", str(tmp_path / "restored_db"))
+    monkeypatch.setattr(config, "EMBEDDER_STATS_DIRECTORY", str(tmp_path / "restored_db" / "embedder_stats"))
+    restored = VectorStore()
+    restored.import_snapshot(snapshot.path)
+
+    assert restored.count_documents() == snapshot.count_documents()
+    for query in QUERIES:
+        assert urls(restored.similarity_search_with_scores(query, k=1)) == \
+            urls(snapshot.similarity_search_with_scores(query, k=1))
+
+
+def test_other_embedders_are_rejected(snapshot, monkeypatch):
+    monkeypatch.setattr(config, "EMBEDDER", "another-embedder")
+    with pytest.raises(ValueError):
+        SnapshotIndex(snapshot.path)
+
+
+def test_filter_mask_matches_metadata(snapshot):
+    def matching_types(filters):
+        mask = snapshot.filter_mask(filters)
+        return {snapshot.get_metadata(row)["type"] for row in np.flatnonzero(mask)}, int(mask.sum())
+
+    assert snapshot.filter_mask(None) is None
+    assert matching_types({"type": "api"}) == ({"api"}, 8)
+    assert matching_types({"type": ["api", "guide"]}) == ({"api", "guide"}, 16)
+    assert matching_types({"path_prefix": "/guide/advanced"}) == ({"guide"}, 4)
+    assert matching_types({"type": "api", "path_prefix": "/guide/"}) == (set(), 0)
+    assert matching_types({"type": None}) == ({"api", "guide", "examples"}, len(PAGES))
+    assert not snapshot.filter_mask({"missing_field": "x"}).any()
+
+
+def test_filtered_search_only_returns_matching_documents(snapshot):
+    results = snapshot.similarity_search_with_scores("install with pip", k=5, filters={"type": "examples"})
+    assert len(results) == 5
+    assert all(doc.metadata["type"] == "examples" for doc, _ in results)
+
+
+def test_filter_codes_are_cached(snapshot):
+    first = snapshot.filter_mask({"type": ["guide", "api"]})
+    cached = dict(snapshot._allowed_codes)
+    second = snapshot.filter_mask({"type": ["api", "guide"]})
+
+    np.testing.assert_array_equal(first, second)
+    assert snapshot._allowed_codes == cached